@@ -1,8 +1,23 @@
+import queue
 from celery import shared_task
-from services.openai_service import openai_service
-from database import SessionLocal
+from sqlalchemy import select
+from services.openai_service import STREAM_RESTART, VARIANT_TONES, GenerationError, openai_service
+from services.response_cache import response_cache
+from services.dedup import DraftIndex, topic_tokens
+from services.singleflight import SingleFlight
+from services.pagination import DEFAULT_PAGE_SIZE, keyset_page, keyset_page_query, project_row, projected_select
+from database import SessionLocal, AsyncSessionLocal
 from models import Post, Trend, AgentLog
 from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+# Manual generations for the same topic share one run, across API and worker processes
+topic_generation = SingleFlight("generate_content_for_topic")
+
+def topic_flight_key(topic: str, platforms: List[str]) -> str:
+    """Singleflight key: "#AI" and "ai" for the same platforms are the same generation"""
+    normalized = " ".join(sorted(topic_tokens(topic))) or topic.strip().lower()
+    return f"{normalized}|{','.join(sorted(platforms))}"
 
 @shared_task
 def generate_content_for_trends():
@@ -15,51 +30,80 @@ def generate_content_for_trends():
         ).order_by(Trend.volume.desc()).limit(5).all()
         
         posts_created = 0
+        generation_failures = 0
+        duplicates_skipped = 0
+        requests = []
+        
+        # Recent posts by normalized topic and body: "#AI", "ai" and "AI (Optimized)" are one topic
+        index = DraftIndex.load(db)
         
         for trend in recent_trends:
             # Generate content for each platform
             platforms = ["twitter", "linkedin", "instagram"]
             
+            # A manual generation for this topic is running right now; its drafts are on the way
+            if topic_generation.running(topic_flight_key(trend.topic, platforms)):
+                duplicates_skipped += len(platforms)
+                continue
+            
             for platform in platforms:
-                # Check if we already have a post for this trend+platform
-                existing_post = db.query(Post).filter(
-                    Post.topic == trend.topic,
-                    Post.platform == platform,
-                    Post.created_at >= datetime.utcnow() - timedelta(hours=1)
-                ).first()
+                # Skip topics already covered on this platform, before paying for a generation
+                if index.similar_topic(trend.topic, platform) is not None:
+                    duplicates_skipped += 1
+                    continue
                 
-                if not existing_post:
-                    # Generate content
-                    content = openai_service.generate_post_content(
-                        topic=trend.topic,
-                        platform=platform,
-                        tone="engaging"
-                    )
-                    
-                    # Create post record
-                    post = Post(
-                        topic=trend.topic,
-                        content=content,
-                        platform=platform,
-                        status="draft",
-                        scheduled_for=datetime.utcnow() + timedelta(minutes=30)
-                    )
-                    db.add(post)
-                    posts_created += 1
+                # Indexed right away so near-identical trends in this batch dedup against it
+                index.add(trend.topic, platform)
+                requests.append({"topic": trend.topic, "platform": platform, "tone": "engaging"})
+        
+        # Generate all missing posts concurrently
+        contents = openai_service.generate_batch(requests)
+        
+        for request, content in zip(requests, contents):
+            # Failed generations are retried next tick rather than saved as drafts
+            if isinstance(content, GenerationError):
+                generation_failures += 1
+                continue
+            
+            if index.similar_content(content, request["platform"]) is not None:
+                duplicates_skipped += 1
+                continue
+            index.add(request["topic"], request["platform"], content)
+            
+            # Create post record
+            post = Post(
+                topic=request["topic"],
+                content=content,
+                platform=request["platform"],
+                status="draft",
+                scheduled_for=datetime.utcnow() + timedelta(minutes=30)
+            )
+            db.add(post)
+            posts_created += 1
         
         db.commit()
+        response_cache.refresh("drafts", get_current_drafts)
         
         # Log agent activity
         log = AgentLog(
             agent_name="content_crafter",
             action="generate_content_for_trends",
-            data={"posts_created": posts_created},
+            data={
+                "posts_created": posts_created,
+                "generation_failures": generation_failures,
+                "duplicates_skipped": duplicates_skipped
+            },
             success=True
         )
         db.add(log)
         db.commit()
         
-        return {"status": "success", "posts_created": posts_created}
+        return {
+            "status": "success",
+            "posts_created": posts_created,
+            "generation_failures": generation_failures,
+            "duplicates_skipped": duplicates_skipped
+        }
         
     except Exception as e:
         db.rollback()
@@ -75,16 +119,33 @@ def generate_content_for_trends():
     finally:
         db.close()
 
-def generate_content_for_topic(topic: str):
-    """Generate content for a specific topic"""
+def generate_content_for_topic(topic: str, force_refresh: bool = False):
+    """Generate content for a specific topic (force_refresh bypasses the generation cache).
+
+    Concurrent calls for the same topic and platforms, in this process or any
+    other, wait for the first one and all get its drafts back.
+    """
+    platforms = ["twitter", "linkedin", "instagram"]
+    return topic_generation.do(
+        topic_flight_key(topic, platforms),
+        lambda: _generate_content_for_topic(topic, platforms, force_refresh)
+    )
+
+def _generate_content_for_topic(topic: str, platforms: List[str], force_refresh: bool):
     db = SessionLocal()
     try:
-        platforms = ["twitter", "linkedin", "instagram"]
         drafts = []
+        failed = 0
+        
+        # All platforms' variants are generated concurrently
+        variants_by_platform = openai_service.generate_topic_variants(topic, platforms, 2, force_refresh=force_refresh)
         
         for platform in platforms:
-            variants = openai_service.generate_content_variants(topic, platform, 2)
+            variants = variants_by_platform[platform]
             for i, content in enumerate(variants):
+                if isinstance(content, GenerationError):
+                    failed += 1
+                    continue
                 post = Post(
                     topic=topic,
                     content=content,
@@ -100,8 +161,12 @@ def generate_content_for_topic(topic: str):
                     "variant": f"A" if i == 0 else "B"
                 })
         
+        if not drafts:
+            return {"status": "error", "message": "Content generation failed, please try again"}
+        
         db.commit()
-        return {"status": "success", "drafts": drafts}
+        response_cache.refresh("drafts", get_current_drafts)
+        return {"status": "success", "drafts": drafts, "failed": failed}
         
     except Exception as e:
         db.rollback()
@@ -109,22 +174,129 @@ def generate_content_for_topic(topic: str):
     finally:
         db.close()
 
-def get_current_drafts():
-    """Get current content drafts"""
+def _save_draft(topic: str, platform: str, content: str) -> int:
     db = SessionLocal()
     try:
-        posts = db.query(Post).filter(Post.status == "draft").order_by(Post.created_at.desc()).limit(20).all()
-        return [
-            {
-                "id": post.id,
-                "topic": post.topic,
-                "platform": post.platform,
-                "content": post.content,
-                "status": post.status,
-                "createdAt": post.created_at.isoformat(),
-                "scheduledFor": post.scheduled_for.isoformat() if post.scheduled_for else None
-            }
-            for post in posts
-        ]
+        post = Post(
+            topic=topic,
+            content=content,
+            platform=platform,
+            status="draft",
+            scheduled_for=datetime.utcnow() + timedelta(hours=1)
+        )
+        db.add(post)
+        db.commit()
+        return post.id
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _log_stream_failure(topic: str, platform: str, variant: str, error: Exception):
+    db = SessionLocal()
+    try:
+        log = AgentLog(
+            agent_name="content_crafter",
+            action="stream_content_for_topic",
+            data={"topic": topic, "platform": platform, "variant": variant, "error": str(error)},
+            success=False
+        )
+        db.add(log)
+        db.commit()
+    finally:
+        db.close()
+
+def _stream_variant(events: queue.Queue, topic: str, platform: str, variant: str, tone: str, force_refresh: bool):
+    """Stream one variant into `events` and save it as a draft once it is complete"""
+    tag = {"platform": platform, "variant": variant}
+    parts = []
+    try:
+        for delta in openai_service.stream_post_content(topic, platform, tone, force_refresh=force_refresh):
+            if delta is STREAM_RESTART:
+                # A fallback model starts the variant over
+                parts = []
+                events.put({"event": "reset", **tag})
+                continue
+            parts.append(delta)
+            events.put({"event": "token", **tag, "delta": delta})
+        content = "".join(parts).strip()
+        post_id = _save_draft(topic, platform, content)
+        # Each draft shows up on the dashboard as soon as it is saved
+        response_cache.invalidate("drafts")
+        events.put({"event": "draft", **tag, "id": post_id, "topic": topic, "content": content})
+    except Exception as e:
+        events.put({"event": "error", **tag, "message": str(e)})
+        _log_stream_failure(topic, platform, variant, e)
+
+def stream_content_for_topic(topic: str, force_refresh: bool = False) -> Iterator[Dict]:
+    """generate_content_for_topic() as a stream of events, for the streaming endpoint.
+
+    All variants are streamed concurrently (one completion each rather than a
+    bundle, so text can be attributed as it arrives). Events are dicts with an
+    "event" key: "token" (platform, variant, delta), "reset" (platform, variant:
+    a fallback model replaces the variant's text so far), "draft" (a variant
+    finished and was saved: platform, variant, id, content), "error" (platform,
+    variant, message) and finally "done" (drafts, failed counts).
+
+    Generation starts when this is called, on the stream threads and in the
+    caller's context (so with its rate-limit priority); drafts are saved even
+    if the consumer stops reading.
+    """
+    platforms = ["twitter", "linkedin", "instagram"]
+    events = queue.Queue()
+    jobs = [
+        (platform, "A" if i == 0 else "B", VARIANT_TONES[i])
+        for platform in platforms
+        for i in range(2)
+    ]
+    for platform, variant, tone in jobs:
+        openai_service.submit_stream(_stream_variant, events, topic, platform, variant, tone, force_refresh)
+
+    def drain():
+        drafts = failed = 0
+        while drafts + failed < len(jobs):
+            event = events.get()
+            if event["event"] == "draft":
+                drafts += 1
+            elif event["event"] == "error":
+                failed += 1
+            yield event
+        yield {"event": "done", "topic": topic, "drafts": drafts, "failed": failed}
+
+    return drain()
+
+# Response field -> column it is read from; ?fields= picks a subset (e.g. without content)
+DRAFT_FIELDS = {
+    "id": Post.id,
+    "topic": Post.topic,
+    "platform": Post.platform,
+    "content": Post.content,
+    "status": Post.status,
+    "createdAt": Post.created_at,
+    "scheduledFor": Post.scheduled_for,
+}
+
+def _current_drafts_query(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, platform: Optional[str] = None,
+                          topic: Optional[str] = None, since: datetime = None, until: datetime = None,
+                          fields: Optional[List[str]] = None):
+    return keyset_page_query(
+        projected_select(DRAFT_FIELDS, fields, Post.created_at, Post.id), Post, Post.created_at,
+        limit, cursor, since, until, status="draft", platform=platform, topic=topic,
+    )
+
+def _drafts_page(rows, limit: int = DEFAULT_PAGE_SIZE):
+    rows, next_cursor = keyset_page(rows, limit)
+    return {"data": [project_row(row) for row in rows], "nextCursor": next_cursor}
+
+def get_current_drafts(**filters):
+    """Get current content drafts, newest first: {"data": [...], "nextCursor": ...}"""
+    db = SessionLocal()
+    try:
+        rows = db.execute(_current_drafts_query(**filters)).all()
+        return _drafts_page(rows, filters.get("limit", DEFAULT_PAGE_SIZE))
+    finally:
+        db.close()
+
+async def get_current_drafts_async(**filters):
+    """Async variant of get_current_drafts for the API"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(_current_drafts_query(**filters))).all()
+        return _drafts_page(rows, filters.get("limit", DEFAULT_PAGE_SIZE))
\ No newline at end of file
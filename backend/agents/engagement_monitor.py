@@ -1,10 +1,19 @@
 from celery import shared_task
+from sqlalchemy import distinct, func, select
+from sqlalchemy.dialects.postgresql import insert
 from services.social_media_service import social_media_service
-from database import SessionLocal
-from models import Post, Metrics, AgentLog
-from datetime import datetime
-import requests
-import os
+from services.response_cache import response_cache
+from services.pagination import keyset_page, keyset_page_query, project_row, projected_select
+from database import SessionLocal, AsyncSessionLocal
+from models import Post, Metrics, AgentLog, EngagementRollupHourly, EngagementRollupDaily
+from datetime import datetime, timedelta, timezone
+
+# Additive rollup columns; everything else in a rollup row is descriptive
+ROLLUP_SUMS = ["samples", "likes", "shares", "comments", "clicks", "engagement_rate_sum"]
+# Snapshot columns that are running totals; rollups add up their change between snapshots
+ENGAGEMENT_TOTALS = ["likes", "shares", "comments", "clicks"]
+
+METRICS_PAGE_SIZE = 50
 
 @shared_task
 def check_engagement():
@@ -18,10 +27,14 @@ def check_engagement():
         ).all()
         
         metrics_updated = 0
+        samples = []
+        
+        # Fetch real engagement metrics from social media platforms, one batch per platform
+        engagement = fetch_engagement_metrics_batch(posted_posts)
         
+        snapshots = []
         for post in posted_posts:
-            # Fetch real engagement metrics from social media platforms
-            engagement_data = fetch_engagement_metrics(post)
+            engagement_data = engagement.get(post.id)
             
             if engagement_data:
                 # Create or update metrics
@@ -35,10 +48,16 @@ def check_engagement():
                     engagement_rate=engagement_data.get("engagement_rate", 0)
                 )
                 
-                db.add(metrics)
+                snapshots.append(metrics)
+                samples.append((post, engagement_data))
                 metrics_updated += 1
         
+        # Fold the new snapshots into the rollups in the same transaction (before they are written)
+        record_engagement_rollups(db, samples)
+        db.add_all(snapshots)
+        
         db.commit()
+        response_cache.refresh("metrics", get_engagement_metrics)
         
         # Log agent activity
         log = AgentLog(
@@ -66,56 +85,25 @@ def check_engagement():
     finally:
         db.close()
 
-def fetch_engagement_metrics(post):
-    """Fetch real engagement metrics from social media platforms"""
-    try:
-        if post.platform == "twitter":
-            return fetch_twitter_engagement(post)
-        elif post.platform == "linkedin":
-            return fetch_linkedin_engagement(post)
-        elif post.platform == "instagram":
-            return fetch_instagram_engagement(post)
-        else:
-            # For platforms without direct API access, use estimated metrics
-            return estimate_engagement_metrics(post)
-    except Exception as e:
-        print(f"Error fetching engagement for {post.platform}: {e}")
-        return estimate_engagement_metrics(post)
-
-def fetch_twitter_engagement(post):
-    """Fetch Twitter engagement metrics"""
-    try:
-        # Use Twitter API v2 to get tweet metrics
-        bearer_token = os.getenv("TWITTER_BEARER_TOKEN")
-        if not bearer_token:
-            return estimate_engagement_metrics(post)
-        
-        # This would require the tweet ID from the post
-        # For now, return estimated metrics
-        return estimate_engagement_metrics(post)
-    except Exception as e:
-        print(f"Twitter engagement fetch error: {e}")
-        return estimate_engagement_metrics(post)
-
-def fetch_linkedin_engagement(post):
-    """Fetch LinkedIn engagement metrics"""
-    try:
-        # LinkedIn API requires specific permissions for engagement data
-        # For now, return estimated metrics
-        return estimate_engagement_metrics(post)
-    except Exception as e:
-        print(f"LinkedIn engagement fetch error: {e}")
-        return estimate_engagement_metrics(post)
-
-def fetch_instagram_engagement(post):
-    """Fetch Instagram engagement metrics"""
-    try:
-        # Instagram Graph API requires business account and permissions
-        # For now, return estimated metrics
-        return estimate_engagement_metrics(post)
-    except Exception as e:
-        print(f"Instagram engagement fetch error: {e}")
-        return estimate_engagement_metrics(post)
+def fetch_engagement_metrics_batch(posts) -> dict:
+    """Engagement metrics for `posts` by post id: measured by each platform's adapter where it can, else estimated"""
+    by_platform = {}
+    for post in posts:
+        by_platform.setdefault(post.platform, []).append(post)
+    
+    metrics = {}
+    for platform, platform_posts in by_platform.items():
+        adapter = social_media_service.platforms.get(platform)
+        measured = {}
+        if adapter is not None:
+            try:
+                measured = adapter.fetch_metrics_batch(platform_posts)
+            except Exception as e:
+                print(f"Error fetching engagement for {platform}: {e}")
+        for post in platform_posts:
+            # For platforms without engagement API access, use estimated metrics
+            metrics[post.id] = measured.get(post.id) or estimate_engagement_metrics(post)
+    return metrics
 
 def estimate_engagement_metrics(post):
     """Estimate engagement metrics based on platform and content"""
@@ -159,40 +147,155 @@ def estimate_engagement_metrics(post):
         "engagement_rate": engagement_rate
     }
 
-def get_engagement_metrics():
-    """Get engagement metrics for dashboard"""
+def previous_engagement_totals(db, post_ids) -> dict:
+    """Each post's latest stored snapshot totals, by post id"""
+    if not post_ids:
+        return {}
+    rows = db.execute(
+        select(Metrics.post_id, *(Metrics.__table__.c[column] for column in ENGAGEMENT_TOTALS))
+        .where(Metrics.post_id.in_(post_ids))
+        .order_by(Metrics.post_id, Metrics.measured_at.desc(), Metrics.id.desc())
+        .distinct(Metrics.post_id)
+    ).all()
+    return {row.post_id: {column: getattr(row, column) or 0 for column in ENGAGEMENT_TOTALS} for row in rows}
+
+def record_engagement_rollups(db, samples, measured_at: datetime = None):
+    """Add a batch of (post, engagement_data) snapshots to the hourly and daily rollups.
+
+    Snapshots carry running totals, so a bucket gets each post's change since
+    its previous snapshot (read from metrics: call this before the new
+    snapshots are written). Summing a post's buckets over any window gives the
+    engagement it gained in that window.
+    """
+    if not samples:
+        return
+
+    measured_at = measured_at or datetime.now(timezone.utc)
+    previous = previous_engagement_totals(db, {post.id for post, _ in samples})
+
+    # One row per post; a post measured twice in a batch adds up both changes
+    rows = {}
+    for post, engagement_data in samples:
+        row = rows.setdefault(post.id, {
+            "post_id": post.id,
+            "platform": post.platform,
+            "topic": post.topic,
+            **{column: 0 for column in ROLLUP_SUMS},
+        })
+        last = previous.get(post.id, {})
+        row["samples"] += 1
+        for column in ENGAGEMENT_TOTALS:
+            total = engagement_data.get(column, 0)
+            row[column] += total - last.get(column, 0)
+        previous[post.id] = {column: engagement_data.get(column, 0) for column in ENGAGEMENT_TOTALS}
+        row["engagement_rate_sum"] += engagement_data.get("engagement_rate", 0)
+
+    buckets = {
+        EngagementRollupHourly: measured_at.replace(minute=0, second=0, microsecond=0),
+        EngagementRollupDaily: measured_at.replace(hour=0, minute=0, second=0, microsecond=0),
+    }
+    for model, bucket in buckets.items():
+        table = model.__table__
+        stmt = insert(model).values([{**row, "bucket": bucket} for row in rows.values()])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.bucket, table.c.post_id],
+            set_={
+                "platform": stmt.excluded.platform,
+                "topic": stmt.excluded.topic,
+                **{column: table.c[column] + stmt.excluded[column] for column in ROLLUP_SUMS},
+            },
+        )
+        db.execute(stmt)
+
+def _rollup_summary_query(since: datetime = None, model=EngagementRollupDaily):
+    query = select(
+        func.count(distinct(model.post_id)).label("posts"),
+        func.sum(model.samples).label("samples"),
+        func.sum(model.engagement_rate_sum).label("engagement_rate_sum"),
+        func.sum(model.likes).label("likes"),
+        func.sum(model.shares).label("shares"),
+    )
+    if since is not None:
+        query = query.where(model.bucket >= since)
+    return query
+
+def _format_rollup_summary(row):
+    return {
+        "totalPosts": row.posts or 0,
+        "avgEngagement": round(row.engagement_rate_sum / row.samples, 2) if row.samples else 0,
+        "totalLikes": int(row.likes or 0),
+        "totalShares": int(row.shares or 0),
+    }
+
+def summarize_rollups(db, since: datetime = None, model=EngagementRollupDaily):
+    """Aggregate a rollup table, optionally from `since` onwards"""
+    return _format_rollup_summary(db.execute(_rollup_summary_query(since, model)).one())
+
+def _summary_windows():
+    """(since, model) for the all-time, 30-day and 24-hour summaries"""
+    now = datetime.now(timezone.utc)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        "allTime": (None, EngagementRollupDaily),
+        "last30Days": (today - timedelta(days=29), EngagementRollupDaily),
+        "last24Hours": (now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23), EngagementRollupHourly),
+    }
+
+# Response field -> column it is read from
+METRIC_FIELDS = {
+    "id": Metrics.id,
+    "postId": Metrics.post_id,
+    "platform": Metrics.platform,
+    "likes": Metrics.likes,
+    "shares": Metrics.shares,
+    "comments": Metrics.comments,
+    "clicks": Metrics.clicks,
+    "engagementRate": Metrics.engagement_rate,
+    "measuredAt": Metrics.measured_at,
+}
+
+def _latest_metrics_query(limit: int = METRICS_PAGE_SIZE, cursor: str = None, platform: str = None,
+                          post_id: int = None, since: datetime = None, until: datetime = None, fields=None):
+    return keyset_page_query(
+        projected_select(METRIC_FIELDS, fields, Metrics.measured_at, Metrics.id), Metrics, Metrics.measured_at,
+        limit, cursor, since, until, platform=platform, post_id=post_id,
+    )
+
+def _serialize_engagement(rows, summaries, limit: int = METRICS_PAGE_SIZE):
+    rows, next_cursor = keyset_page(rows, limit)
+    body = {
+        "summary": {
+            **summaries["allTime"],
+            "engagementLift": 32,  # Simulated baseline comparison
+            "last30Days": summaries["last30Days"],
+            "last24Hours": summaries["last24Hours"]
+        },
+        "metrics": [project_row(row) for row in rows]
+    }
+    return {"data": body, "nextCursor": next_cursor}
+
+def get_engagement_metrics(**filters):
+    """Get engagement metrics for dashboard: {"data": {"summary", "metrics"}, "nextCursor": ...}"""
     db = SessionLocal()
     try:
-        metrics = db.query(Metrics).order_by(Metrics.measured_at.desc()).limit(50).all()
+        rows = db.execute(_latest_metrics_query(**filters)).all()
         
-        # Calculate summary stats
-        total_posts = len(set(m.post_id for m in metrics))
-        avg_engagement = sum(m.engagement_rate for m in metrics) / len(metrics) if metrics else 0
-        total_likes = sum(m.likes for m in metrics)
-        total_shares = sum(m.shares for m in metrics)
-        
-        return {
-            "summary": {
-                "totalPosts": total_posts,
-                "avgEngagement": round(avg_engagement, 2),
-                "totalLikes": total_likes,
-                "totalShares": total_shares,
-                "engagementLift": 32  # Simulated baseline comparison
-            },
-            "metrics": [
-                {
-                    "id": metric.id,
-                    "postId": metric.post_id,
-                    "platform": metric.platform,
-                    "likes": metric.likes,
-                    "shares": metric.shares,
-                    "comments": metric.comments,
-                    "clicks": metric.clicks,
-                    "engagementRate": metric.engagement_rate,
-                    "measuredAt": metric.measured_at.isoformat()
-                }
-                for metric in metrics
-            ]
+        # Summary stats come from the rollups: all-time, last 30 days and last 24 hours
+        summaries = {
+            name: summarize_rollups(db, since=since, model=model)
+            for name, (since, model) in _summary_windows().items()
         }
+        
+        return _serialize_engagement(rows, summaries, filters.get("limit", METRICS_PAGE_SIZE))
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_engagement_metrics_async(**filters):
+    """Async variant of get_engagement_metrics for the API"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(_latest_metrics_query(**filters))).all()
+        summaries = {}
+        for name, (since, model) in _summary_windows().items():
+            row = (await db.execute(_rollup_summary_query(since, model))).one()
+            summaries[name] = _format_rollup_summary(row)
+        return _serialize_engagement(rows, summaries, filters.get("limit", METRICS_PAGE_SIZE))
\ No newline at end of file
@@ -1,8 +1,19 @@
 from celery import shared_task
+from sqlalchemy import select
 from services.social_media_service import social_media_service
-from database import SessionLocal
+from services.response_cache import response_cache
+from services.pagination import DEFAULT_PAGE_SIZE, keyset_page, keyset_page_query, project_row, projected_select
+from database import SessionLocal, AsyncSessionLocal
 from models import Post, AgentLog
 from datetime import datetime
+from typing import Dict, List, Optional
+
+def publish_batch(platform: str, contents: List[str]) -> List[Dict]:
+    """Publish `contents` through the platform's adapter; one result dict per content"""
+    adapter = social_media_service.platforms.get(platform)
+    if adapter is None:
+        return [{"error": f"Unsupported platform: {platform}"} for _ in contents]
+    return adapter.publish_batch(contents)
 
 @shared_task
 def schedule_pending_posts():
@@ -16,32 +27,34 @@ def schedule_pending_posts():
         ).all()
         
         posts_scheduled = 0
-        
+        by_platform = {}
         for post in pending_posts:
-            # Post directly to social media platform
-            if post.platform == "twitter":
-                result = social_media_service.twitter.post_tweet(post.content)
-            elif post.platform == "linkedin":
-                result = social_media_service.linkedin.post_update(post.content)
-            elif post.platform == "instagram":
-                result = social_media_service.instagram.post_caption(post.content)
-            else:
-                result = {"error": f"Unsupported platform: {post.platform}"}
-            
-            if result.get("success"):
-                post.status = "posted"
-                post.posted_at = datetime.utcnow()
-                posts_scheduled += 1
-            else:
-                post.status = "failed"
+            by_platform.setdefault(post.platform, []).append(post)
+        
+        # Post directly to social media, one batch per platform
+        platform_counts = {}
+        for platform, posts in by_platform.items():
+            results = publish_batch(platform, [post.content for post in posts])
+            counts = platform_counts[platform] = {"posted": 0, "failed": 0}
+            for post, result in zip(posts, results):
+                if result.get("success"):
+                    post.status = "posted"
+                    post.posted_at = datetime.utcnow()
+                    counts["posted"] += 1
+                else:
+                    post.status = "failed"
+                    counts["failed"] += 1
+            posts_scheduled += counts["posted"]
         
         db.commit()
+        response_cache.refresh("posts", get_scheduled_posts)
+        response_cache.invalidate("drafts")
         
         # Log agent activity
         log = AgentLog(
             agent_name="post_scheduler",
             action="schedule_pending_posts",
-            data={"posts_scheduled": posts_scheduled},
+            data={"posts_scheduled": posts_scheduled, "platforms": platform_counts},
             success=True
         )
         db.add(log)
@@ -77,25 +90,21 @@ def schedule_post(post_data: dict):
         )
         db.add(post)
         db.commit()
+        response_cache.invalidate("drafts")
         
         # Post directly to social media platform
-        if post_data["platform"] == "twitter":
-            result = social_media_service.twitter.post_tweet(post_data["content"])
-        elif post_data["platform"] == "linkedin":
-            result = social_media_service.linkedin.post_update(post_data["content"])
-        elif post_data["platform"] == "instagram":
-            result = social_media_service.instagram.post_caption(post_data["content"])
-        else:
-            result = {"error": f"Unsupported platform: {post_data['platform']}"}
+        result = publish_batch(post_data["platform"], [post_data["content"]])[0]
         
         if result.get("success"):
             post.status = "posted"
             post.posted_at = datetime.utcnow()
             db.commit()
+            response_cache.invalidate("drafts", "posts")
             return {"status": "success", "post_id": post.id}
         else:
             post.status = "failed"
             db.commit()
+            response_cache.invalidate("drafts")
             return {"status": "error", "message": f"Failed to post: {result.get('error', 'Unknown error')}"}
             
     except Exception as e:
@@ -104,22 +113,46 @@ def schedule_post(post_data: dict):
     finally:
         db.close()
 
-def get_scheduled_posts():
-    """Get scheduled posts"""
+# Statuses listed by /api/posts unless a status filter is given
+PUBLISHED_STATUSES = ["scheduled", "posted"]
+
+# Response field -> column it is read from; ?fields= picks a subset (e.g. without content)
+SCHEDULED_POST_FIELDS = {
+    "id": Post.id,
+    "topic": Post.topic,
+    "platform": Post.platform,
+    "content": Post.content,
+    "status": Post.status,
+    "scheduledFor": Post.scheduled_for,
+    "postedAt": Post.posted_at,
+}
+
+def _scheduled_posts_query(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, platform: Optional[str] = None,
+                           topic: Optional[str] = None, status: Optional[str] = None,
+                           since: datetime = None, until: datetime = None, fields: Optional[List[str]] = None):
+    query = projected_select(SCHEDULED_POST_FIELDS, fields, Post.created_at, Post.id)
+    if status is None:
+        query = query.filter(Post.status.in_(PUBLISHED_STATUSES))
+    return keyset_page_query(
+        query, Post, Post.created_at, limit, cursor, since, until,
+        status=status, platform=platform, topic=topic,
+    )
+
+def _scheduled_posts_page(rows, limit: int = DEFAULT_PAGE_SIZE):
+    rows, next_cursor = keyset_page(rows, limit)
+    return {"data": [project_row(row) for row in rows], "nextCursor": next_cursor}
+
+def get_scheduled_posts(**filters):
+    """Get scheduled posts, newest first: {"data": [...], "nextCursor": ...}"""
     db = SessionLocal()
     try:
-        posts = db.query(Post).filter(Post.status.in_(["scheduled", "posted"])).order_by(Post.scheduled_for.desc()).limit(20).all()
-        return [
-            {
-                "id": post.id,
-                "topic": post.topic,
-                "platform": post.platform,
-                "content": post.content,
-                "status": post.status,
-                "scheduledFor": post.scheduled_for.isoformat() if post.scheduled_for else None,
-                "postedAt": post.posted_at.isoformat() if post.posted_at else None
-            }
-            for post in posts
-        ]
+        rows = db.execute(_scheduled_posts_query(**filters)).all()
+        return _scheduled_posts_page(rows, filters.get("limit", DEFAULT_PAGE_SIZE))
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_scheduled_posts_async(**filters):
+    """Async variant of get_scheduled_posts for the API"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(_scheduled_posts_query(**filters))).all()
+        return _scheduled_posts_page(rows, filters.get("limit", DEFAULT_PAGE_SIZE))
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""
+Partition maintenance and retention for the time-series tables.
+
+trends, metrics and agent_logs are RANGE-partitioned by month (migration 0005).
+enforce_retention runs daily and
+  1. creates the partitions for the coming months,
+  2. writes each partition whose whole range is older than the table's
+     retention to a zstd-compressed JSONL file,
+  3. detaches and drops it once the archive is complete.
+
+Archives can be loaded back into a standalone table for analysis:
+
+    python -m agents.retention restore archive/metrics/metrics_p2025_01.jsonl.zst
+"""
+
+from celery import shared_task
+from sqlalchemy import MetaData, Table, text
+from database import SessionLocal, get_engine
+from services.response_cache import response_cache
+from models import AgentLog
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+import json
+import os
+import re
+import sys
+import zstandard
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive"))
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+ARCHIVE_BATCH_SIZE = 5000
+
+# table -> (partition key, retention in days)
+PARTITIONED_TABLES = {
+    "trends": ("bucket", int(os.getenv("TRENDS_RETENTION_DAYS", "90"))),
+    "metrics": ("measured_at", int(os.getenv("METRICS_RETENTION_DAYS", "365"))),
+    "agent_logs": ("created_at", int(os.getenv("AGENT_LOGS_RETENTION_DAYS", "30"))),
+}
+
+# Cached API responses built from each table
+CACHED_ENDPOINTS = {"trends": "trends", "metrics": "metrics"}
+
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def _utc_literal(month: date) -> str:
+    return f"{month.isoformat()} 00:00:00+00"
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+def list_partitions(db, table: str) -> Dict[str, date]:
+    """Monthly partitions currently attached to `table`, keyed by name"""
+    rows = db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ),
+        {"table": table},
+    ).scalars().all()
+
+    partitions = {}
+    for name in rows:
+        match = PARTITION_NAME.match(name)
+        if match and match.group("table") == table:
+            partitions[name] = date(int(match.group("year")), int(match.group("month")), 1)
+    return partitions
+
+def ensure_partitions(db, table: str, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Create the partitions for the current month and the next `months_ahead` months"""
+    existing = list_partitions(db, table)
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    created = []
+
+    for offset in range(months_ahead + 1):
+        month = _add_months(this_month, offset)
+        name = partition_name(table, month)
+        if name in existing:
+            continue
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{_utc_literal(month)}') TO ('{_utc_literal(_add_months(month, 1))}')"
+        ))
+        created.append(name)
+
+    return created
+
+def expired_partitions(db, table: str, retention_days: int) -> List[str]:
+    """Partitions whose entire range is older than the retention window"""
+    cutoff = datetime.now(timezone.utc).date().toordinal() - retention_days
+    return sorted(
+        name for name, month in list_partitions(db, table).items()
+        if _add_months(month, 1).toordinal() <= cutoff
+    )
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def archive_partition(name: str, table: str) -> Dict:
+    """Stream a partition to <ARCHIVE_DIR>/<table>/<name>.jsonl.zst"""
+    directory = os.path.join(ARCHIVE_DIR, table)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.jsonl.zst")
+    partial_path = f"{path}.partial"
+
+    rows = 0
+    with get_engine().connect() as conn, open(partial_path, "wb") as raw:
+        result = conn.execution_options(stream_results=True, max_row_buffer=ARCHIVE_BATCH_SIZE).execute(
+            text(f"SELECT * FROM {name}")
+        )
+        with zstandard.ZstdCompressor(level=10).stream_writer(raw) as writer:
+            for row in result.mappings():
+                writer.write(json.dumps(dict(row), default=_json_default).encode() + b"\n")
+                rows += 1
+
+    os.replace(partial_path, path)
+    return {"partition": name, "path": path, "rows": rows}
+
+def retire_partition(db, table: str, name: str) -> Dict:
+    """Archive, detach and drop one expired partition.
+
+    The partition stays attached until its archive is written, so a failed
+    export leaves it in place for the next run to retry.
+    """
+    archived = archive_partition(name, table)
+
+    db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    db.commit()
+    return archived
+
+def restore_archive(path: str, target: Optional[str] = None) -> Dict:
+    """Load an archived partition into a standalone table shaped like its parent"""
+    name = os.path.basename(path).split(".")[0]
+    match = PARTITION_NAME.match(name)
+    if not match:
+        raise ValueError(f"Not a partition archive: {path}")
+
+    parent = match.group("table")
+    target = target or f"restored_{name}"
+
+    with get_engine().begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {target} (LIKE {parent} INCLUDING DEFAULTS)"))
+        table = Table(target, MetaData(), autoload_with=conn)
+
+        rows = 0
+        batch = []
+        with open(path, "rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+            buffered = b""
+            while True:
+                chunk = reader.read(1 << 20)
+                if not chunk:
+                    break
+                buffered += chunk
+                *lines, buffered = buffered.split(b"\n")
+                for line in lines:
+                    if line:
+                        batch.append(json.loads(line))
+                if len(batch) >= ARCHIVE_BATCH_SIZE:
+                    conn.execute(table.insert(), batch)
+                    rows += len(batch)
+                    batch = []
+            if buffered.strip():
+                batch.append(json.loads(buffered))
+        if batch:
+            conn.execute(table.insert(), batch)
+            rows += len(batch)
+
+    return {"table": target, "rows": rows}
+
+@shared_task
+def enforce_retention():
+    """Create upcoming partitions and archive expired ones"""
+    db = SessionLocal()
+    try:
+        created = []
+        archived = []
+
+        for table, (_, retention_days) in PARTITIONED_TABLES.items():
+            created.extend(ensure_partitions(db, table))
+            db.commit()
+
+            expired = expired_partitions(db, table, retention_days)
+            for name in expired:
+                archived.append(retire_partition(db, table, name))
+            if expired and table in CACHED_ENDPOINTS:
+                response_cache.invalidate(CACHED_ENDPOINTS[table])
+
+        # Log agent activity
+        log = AgentLog(
+            agent_name="retention",
+            action="enforce_retention",
+            data={"partitions_created": created, "partitions_archived": archived},
+            success=True
+        )
+        db.add(log)
+        db.commit()
+
+        return {"status": "success", "partitions_created": len(created), "partitions_archived": len(archived)}
+
+    except Exception as e:
+        db.rollback()
+        log = AgentLog(
+            agent_name="retention",
+            action="enforce_retention",
+            data={"error": str(e)},
+            success=False
+        )
+        db.add(log)
+        db.commit()
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "restore":
+        print(restore_archive(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None))
+    elif len(sys.argv) == 2 and sys.argv[1] == "run":
+        print(enforce_retention())
+    else:
+        print("usage: python -m agents.retention run | restore <archive.jsonl.zst> [table]")
@@ -1,8 +1,23 @@
 from celery import shared_task
-from services.openai_service import openai_service
-from database import SessionLocal
+from sqlalchemy import select, true
+from sqlalchemy.orm import aliased
+from services.openai_service import GenerationError, openai_service
+from services.response_cache import response_cache
+from services.dedup import DraftIndex
+from database import SessionLocal, AsyncSessionLocal
 from models import Post, Metrics, AgentLog
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+# A post with a rewrite in one of these states is not rewritten again (a failed one doesn't count)
+OPTIMIZED_CHILD_STATUSES = ["draft", "scheduled", "posted"]
+
+def _latest_metrics():
+    """Each post's most recent metrics snapshot, as a LATERAL subquery to join against Post"""
+    return select(
+        Metrics.engagement_rate, Metrics.likes, Metrics.shares, Metrics.comments
+    ).where(
+        Metrics.post_id == Post.id
+    ).order_by(Metrics.measured_at.desc()).limit(1).lateral("latest_metrics")
 
 @shared_task
 def optimize_strategy():
@@ -12,29 +27,58 @@ def optimize_strategy():
         # Get recent posts with poor performance
         cutoff_time = datetime.utcnow() - timedelta(hours=24)
         
-        # Find underperforming posts (engagement rate < 2%)
-        underperforming_query = db.query(Post, Metrics).join(
-            Metrics, Post.id == Metrics.post_id
-        ).filter(
-            Post.posted_at >= cutoff_time,
-            Metrics.engagement_rate < 2.0
+        # Find underperforming posts (engagement rate < 2%) by their latest snapshot only:
+        # check_engagement adds a snapshot every few minutes
+        metrics = _latest_metrics()
+        rewrite = aliased(Post)
+        has_rewrite = select(rewrite.id).where(
+            rewrite.parent_id == Post.id,
+            rewrite.status.in_(OPTIMIZED_CHILD_STATUSES)
+        ).exists()
+        underperforming_query = db.execute(
+            select(Post, metrics).join(metrics, true()).where(
+                Post.status == "posted",
+                Post.posted_at >= cutoff_time,
+                metrics.c.engagement_rate < 2.0,
+                ~has_rewrite
+            )
         ).all()
         
         optimizations_made = 0
+        generation_failures = 0
+        duplicates_skipped = 0
+        index = DraftIndex.load(db)
+        candidates = []
         
-        for post, metrics in underperforming_query:
-            # Generate optimized content
-            performance_data = {
-                "engagement_rate": metrics.engagement_rate,
-                "likes": metrics.likes,
-                "shares": metrics.shares,
-                "comments": metrics.comments
-            }
+        for post, engagement_rate, likes, shares, comments in underperforming_query:
+            # A draft on the same topic is already waiting (an earlier rewrite or fresh content)
+            if index.similar_topic(post.topic, post.platform, statuses=["draft"]) is not None:
+                duplicates_skipped += 1
+                continue
+            index.add(post.topic, post.platform)
+            candidates.append((post, {
+                "engagement_rate": engagement_rate,
+                "likes": likes,
+                "shares": shares,
+                "comments": comments
+            }))
+        
+        # Generate optimized content for all of them concurrently
+        rewrites = openai_service.optimize_batch([
+            {"original_content": post.content, "performance_data": performance_data}
+            for post, performance_data in candidates
+        ])
+        
+        for (post, _), optimized_content in zip(candidates, rewrites):
+            if isinstance(optimized_content, GenerationError):
+                # Skip it; the post is still underperforming on the next run
+                generation_failures += 1
+                continue
             
-            optimized_content = openai_service.optimize_content(
-                post.content,
-                performance_data
-            )
+            if index.similar_content(optimized_content, post.platform) is not None:
+                duplicates_skipped += 1
+                continue
+            index.add(post.topic, post.platform, optimized_content)
             
             # Create new optimized post
             new_post = Post(
@@ -42,33 +86,36 @@ def optimize_strategy():
                 content=optimized_content,
                 platform=post.platform,
                 status="draft",
-                scheduled_for=datetime.utcnow() + timedelta(hours=2)
+                scheduled_for=datetime.utcnow() + timedelta(hours=2),
+                parent_id=post.id
             )
             
             db.add(new_post)
             optimizations_made += 1
         
         # Analyze successful patterns
-        successful_posts = db.query(Post, Metrics).join(
-            Metrics, Post.id == Metrics.post_id
-        ).filter(
-            Post.posted_at >= cutoff_time,
-            Metrics.engagement_rate >= 5.0
-        ).limit(10).all()
+        successful_posts = db.execute(
+            select(Post, metrics.c.engagement_rate).join(metrics, true()).where(
+                Post.status == "posted",
+                Post.posted_at >= cutoff_time,
+                metrics.c.engagement_rate >= 5.0
+            ).limit(10)
+        ).all()
         
         strategies_identified = []
         
-        for post, metrics in successful_posts:
+        for post, engagement_rate in successful_posts:
             strategy = {
                 "platform": post.platform,
                 "topic": post.topic,
-                "engagement_rate": metrics.engagement_rate,
+                "engagement_rate": engagement_rate,
                 "content_length": len(post.content),
                 "hashtag_count": post.content.count("#")
             }
             strategies_identified.append(strategy)
         
         db.commit()
+        response_cache.invalidate("drafts")
         
         # Log agent activity
         log = AgentLog(
@@ -76,12 +123,15 @@ def optimize_strategy():
             action="optimize_strategy",
             data={
                 "optimizations_made": optimizations_made,
+                "generation_failures": generation_failures,
+                "duplicates_skipped": duplicates_skipped,
                 "successful_patterns": len(strategies_identified)
             },
             success=True
         )
         db.add(log)
         db.commit()
+        response_cache.refresh("insights", get_optimization_insights)
         
         return {
             "status": "success",
@@ -99,30 +149,42 @@ def optimize_strategy():
         )
         db.add(log)
         db.commit()
+        response_cache.invalidate("insights")
         return {"status": "error", "message": str(e)}
     finally:
         db.close()
 
+def _optimization_insights_query():
+    return select(AgentLog.action, AgentLog.data, AgentLog.success, AgentLog.created_at).filter(
+        AgentLog.agent_name == "strategy_optimizer",
+        AgentLog.created_at >= datetime.now(timezone.utc) - timedelta(days=7)
+    ).order_by(AgentLog.created_at.desc()).limit(10)
+
+def _serialize_insights(recent_logs):
+    return {
+        "recent_optimizations": [
+            {
+                "action": log.action,
+                "data": log.data,
+                "success": log.success,
+                "created_at": log.created_at.isoformat()
+            }
+            for log in recent_logs
+        ]
+    }
+
 def get_optimization_insights():
     """Get strategy optimization insights"""
     db = SessionLocal()
     try:
         # Get recent optimizations
-        recent_logs = db.query(AgentLog).filter(
-            AgentLog.agent_name == "strategy_optimizer",
-            AgentLog.created_at >= datetime.utcnow() - timedelta(days=7)
-        ).order_by(AgentLog.created_at.desc()).limit(10).all()
-        
-        return {
-            "recent_optimizations": [
-                {
-                    "action": log.action,
-                    "data": log.data,
-                    "success": log.success,
-                    "created_at": log.created_at.isoformat()
-                }
-                for log in recent_logs
-            ]
-        }
+        recent_logs = db.execute(_optimization_insights_query()).all()
+        return _serialize_insights(recent_logs)
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_optimization_insights_async():
+    """Async variant of get_optimization_insights for the API"""
+    async with AsyncSessionLocal() as db:
+        recent_logs = (await db.execute(_optimization_insights_query())).all()
+        return _serialize_insights(recent_logs)
\ No newline at end of file
@@ -1,42 +1,92 @@
 from celery import shared_task
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 from services.social_media_service import social_media_service
-from database import SessionLocal
+from services.trend_cache import trend_cache
+from services.response_cache import response_cache
+from services.pagination import DEFAULT_PAGE_SIZE, keyset_page, keyset_page_query, project_row, projected_select
+from database import SessionLocal, AsyncSessionLocal
 from models import Trend, AgentLog
+from typing import Dict, List, Optional
 import random
-from datetime import datetime
+from datetime import datetime, timezone
+
+def current_bucket(now: datetime = None) -> datetime:
+    """Start of the trend bucket (the UTC hour) containing `now`; matches Trend.bucket's server default"""
+    now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return now.replace(minute=0, second=0, microsecond=0)
+
+def ingest_trends(db, trends: List[Dict]) -> Dict[str, int]:
+    """Upsert a batch of trend sightings in one statement.
+
+    Rows are keyed on (topic, platform, bucket): a topic seen again in the same
+    bucket updates the existing row instead of adding a new one.
+    """
+    bucket = current_bucket()
+
+    # A single INSERT ... ON CONFLICT cannot touch the same row twice, so collapse
+    # repeated sightings in this batch first (keeping the highest volume).
+    rows = {}
+    for trend_data in trends:
+        key = (trend_data["topic"], trend_data["platform"])
+        if key in rows and rows[key]["volume"] >= trend_data["volume"]:
+            continue
+        rows[key] = {
+            "topic": trend_data["topic"],
+            "platform": trend_data["platform"],
+            "volume": trend_data["volume"],
+            "sentiment": random.choice(["positive", "neutral", "negative"]),
+            "growth": random.uniform(-10, 25),
+            "bucket": bucket,
+        }
+
+    if not rows:
+        return {"inserted": 0, "updated": 0}
+
+    stmt = insert(Trend).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Trend.topic, Trend.platform, Trend.bucket],
+        set_={
+            "volume": stmt.excluded.volume,
+            "sentiment": stmt.excluded.sentiment,
+            "growth": stmt.excluded.growth,
+            # clock_timestamp() differs from the now() both timestamps default to on insert
+            "updated_at": func.clock_timestamp(),
+        },
+    ).returning((Trend.updated_at == Trend.created_at).label("inserted"))
+
+    results = db.execute(stmt).scalars().all()
+    inserted = sum(1 for was_inserted in results if was_inserted)
+    return {"inserted": inserted, "updated": len(results) - inserted}
 
 @shared_task
 def monitor_trends():
     """Monitor trending topics across all platforms"""
     db = SessionLocal()
     try:
-        # Fetch trends from all platforms using the unified service
-        all_trends = social_media_service.get_all_trending_topics()
+        # Fetch trends from all platforms concurrently using the unified service
+        report = social_media_service.collect_trending_topics()
+        all_trends = report["topics"]
+        # GET /api/social/trends serves these instead of calling the platforms itself
+        trend_cache.store(report)
         
         # Save trends to database
-        for trend_data in all_trends:
-            trend = Trend(
-                topic=trend_data["topic"],
-                platform=trend_data["platform"],
-                volume=trend_data["volume"],
-                sentiment=random.choice(["positive", "neutral", "negative"]),
-                growth=random.uniform(-10, 25)
-            )
-            db.add(trend)
+        counts = ingest_trends(db, all_trends)
         
         db.commit()
+        response_cache.refresh("trends", get_current_trends)
         
         # Log agent activity
         log = AgentLog(
             agent_name="trend_watcher",
             action="monitor_trends",
-            data={"trends_found": len(all_trends)},
+            data={"trends_found": len(all_trends), **counts, "platforms": report["platforms"]},
             success=True
         )
         db.add(log)
         db.commit()
         
-        return {"status": "success", "trends_found": len(all_trends)}
+        return {"status": "success", "trends_found": len(all_trends), **counts}
         
     except Exception as e:
         db.rollback()
@@ -52,22 +102,40 @@ def monitor_trends():
     finally:
         db.close()
 
-def get_current_trends():
-    """Get current trending topics"""
+# Response field -> column (or expression) it is read from
+TREND_FIELDS = {
+    "id": Trend.id,
+    "topic": Trend.topic,
+    "platform": Trend.platform,
+    "volume": Trend.volume,
+    "sentiment": Trend.sentiment,
+    "growth": Trend.growth,
+    "lastUpdated": func.coalesce(Trend.updated_at, Trend.created_at),
+}
+
+def _current_trends_query(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, platform: Optional[str] = None,
+                          topic: Optional[str] = None, since: datetime = None, until: datetime = None,
+                          fields: Optional[List[str]] = None):
+    return keyset_page_query(
+        projected_select(TREND_FIELDS, fields, Trend.created_at, Trend.id), Trend, Trend.created_at,
+        limit, cursor, since, until, platform=platform, topic=topic,
+    )
+
+def _trends_page(rows, limit: int = DEFAULT_PAGE_SIZE):
+    rows, next_cursor = keyset_page(rows, limit)
+    return {"data": [project_row(row) for row in rows], "nextCursor": next_cursor}
+
+def get_current_trends(**filters):
+    """Get current trending topics, newest first: {"data": [...], "nextCursor": ...}"""
     db = SessionLocal()
     try:
-        trends = db.query(Trend).order_by(Trend.created_at.desc()).limit(20).all()
-        return [
-            {
-                "id": trend.id,
-                "topic": trend.topic,
-                "platform": trend.platform,
-                "volume": trend.volume,
-                "sentiment": trend.sentiment,
-                "growth": trend.growth,
-                "lastUpdated": trend.created_at.isoformat()
-            }
-            for trend in trends
-        ]
+        rows = db.execute(_current_trends_query(**filters)).all()
+        return _trends_page(rows, filters.get("limit", DEFAULT_PAGE_SIZE))
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_current_trends_async(**filters):
+    """Async variant of get_current_trends for the API"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(_current_trends_query(**filters))).all()
+        return _trends_page(rows, filters.get("limit", DEFAULT_PAGE_SIZE))
\ No newline at end of file
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the LLM-heavy agent tasks.
+
+Runs generate_content_for_trends and optimize_strategy against a replayed or
+synthetic LLM backend (services/llm_backends.py), so no OpenAI budget or
+network access is needed, and prints wall time and LLM call counts per run.
+
+    python benchmarks/llm_pipeline.py --posts 500 --latency lognormal:0.8,0.4
+    python benchmarks/llm_pipeline.py --backend replay --recording llm_recordings.jsonl
+
+Tables are created in the `llmbench` schema and the tasks' connections use it
+as their search_path (dropped at the end unless --keep), so it is safe to point
+at a development database. The generation cache is off unless --cache is given;
+the shared OpenAI rate limiter still applies when Redis is reachable.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA = "llmbench"
+
+SEED_SQL = {
+    "trends": """
+        INSERT INTO trends (topic, platform, volume, sentiment, growth)
+        SELECT '#bench' || :run || '_' || g, 'twitter', 1000 + g, 'neutral', 5
+        FROM generate_series(1, :trends) AS g
+    """,
+    # Posted in the last day and underperforming, so optimize_strategy rewrites every one
+    "posts": """
+        INSERT INTO posts (topic, content, platform, status, posted_at)
+        SELECT '#bench' || :run || '_post' || g, 'Benchmark post ' || g || ' #bench',
+               (ARRAY['twitter','linkedin','instagram'])[1 + g % 3], 'posted', now() - interval '1 hour'
+        FROM generate_series(1, :posts) AS g
+    """,
+    # check_engagement's snapshot every 3 minutes
+    "metrics": """
+        INSERT INTO metrics (post_id, platform, likes, shares, comments, clicks, engagement_rate, measured_at)
+        SELECT id, platform, 1, 0, 0, 1, 1.0, now() - s * interval '3 minutes'
+        FROM posts, generate_series(0, :snapshots - 1) AS s
+        WHERE topic LIKE '#bench' || :run || '_post%'
+    """,
+}
+
+
+def configure(args):
+    # Read by services/llm_backends.py and services/generation_cache.py at import time
+    os.environ["LLM_BACKEND"] = args.backend
+    os.environ["GENERATION_CACHE_ENABLED"] = "true" if args.cache else "false"
+    if args.recording:
+        os.environ["LLM_RECORDING_FILE"] = args.recording
+    if args.latency:
+        os.environ["LLM_REPLAY_LATENCY" if args.backend == "replay" else "LLM_SYNTHETIC_LATENCY"] = args.latency
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+
+
+def setup_schema():
+    from sqlalchemy import event, text
+    from sqlalchemy.schema import CreateTable
+
+    from database import Base, get_engine
+    import models  # noqa: F401
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        scoped = conn.execution_options(schema_translate_map={None: SCHEMA})
+        for table in Base.metadata.sorted_tables:
+            scoped.execute(CreateTable(table, include_foreign_key_constraints=[]))
+            if table.dialect_options["postgresql"]["partition_by"]:
+                conn.execute(text(f"CREATE TABLE {SCHEMA}.{table.name}_default PARTITION OF {SCHEMA}.{table.name} DEFAULT"))
+
+    # Every connection the agents open from here on works in the benchmark schema
+    engine.dispose()
+
+    @event.listens_for(engine, "connect")
+    def _search_path(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+        cursor.close()
+
+
+def seed(run: int, trends: int, posts: int, snapshots: int):
+    from sqlalchemy import text
+
+    from database import get_engine
+
+    with get_engine().begin() as conn:
+        # Runs start from the same state rather than piling up earlier runs' drafts and rewrites
+        conn.execute(text("TRUNCATE trends, metrics, posts, agent_logs"))
+        for sql in SEED_SQL.values():
+            conn.execute(text(sql), {"run": run, "trends": trends, "posts": posts, "snapshots": snapshots})
+
+
+class CallCounter:
+    """Wraps the LLM backend to count calls"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, **params):
+        with self._lock:
+            self.calls += 1
+        return self.backend.create(**params)
+
+
+def timed(task, counter: CallCounter):
+    counter.calls = 0
+    started = time.perf_counter()
+    result = task()
+    return time.perf_counter() - started, counter.calls, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["synthetic", "replay"], default="synthetic")
+    parser.add_argument("--latency", help="latency distribution, e.g. fixed:0.5, uniform:0.2,1.5, lognormal:0.8,0.4")
+    parser.add_argument("--recording", help="recording file for --backend replay (default: LLM_RECORDING_FILE)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--trends", type=int, default=5, help="fresh trends seeded per run")
+    parser.add_argument("--posts", type=int, default=100, help="underperforming posts seeded per run")
+    parser.add_argument("--snapshots", type=int, default=20, help="metrics snapshots per seeded post")
+    parser.add_argument("--cache", action="store_true", help="leave the generation cache on")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    configure(args)
+    setup_schema()
+
+    from sqlalchemy import text
+
+    from agents.content_crafter import generate_content_for_trends
+    from agents.strategy_optimizer import optimize_strategy
+    from database import get_engine
+    from services.openai_service import openai_service
+
+    counter = CallCounter(openai_service.backend)
+    openai_service.backend = counter
+    tasks = {"generate_content_for_trends": generate_content_for_trends, "optimize_strategy": optimize_strategy}
+    timings = {name: [] for name in tasks}
+
+    print(f"backend={args.backend} latency={args.latency or 'default'} trends={args.trends} posts={args.posts} "
+          f"snapshots={args.snapshots}")
+    print(f"\n  {'run':>3} {'task':<28} {'seconds':>8} {'llm calls':>10} {'calls/s':>8}  result")
+    try:
+        for run in range(1, args.runs + 1):
+            seed(run, args.trends, args.posts, args.snapshots)
+            for name, task in tasks.items():
+                seconds, calls, result = timed(task, counter)
+                timings[name].append(seconds)
+                print(f"  {run:>3} {name:<28} {seconds:>8.2f} {calls:>10} {calls / seconds:>8.1f}  {result}")
+
+        print(f"\n  {'task':<28} {'mean (s)':>9} {'max (s)':>8}")
+        for name, values in timings.items():
+            print(f"  {name:<28} {statistics.mean(values):>9.2f} {max(values):>8.2f}")
+    finally:
+        if not args.keep:
+            get_engine().dispose()
+            with get_engine().begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Query plan / timing benchmark for the agents' hot queries.
+
+Seeds a scratch schema with N rows per table, runs each hot query with
+EXPLAIN (ANALYZE, BUFFERS) before and after the indexes declared in
+models.py are built, and prints the plans and timings side by side.
+
+    python benchmarks/query_plans.py --rows 1000000 10000000
+
+Everything happens in the `bench` schema (dropped at the end unless --keep),
+so it is safe to point at a development database.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database import get_engine, Base
+import models  # noqa: F401
+
+SCHEMA = "bench"
+
+# Each table is filled with the same number of rows, spread over the last year.
+SEED_SQL = {
+    "posts": """
+        INSERT INTO posts (topic, content, platform, status, scheduled_for, posted_at, created_at)
+        SELECT '#topic' || (g % 5000),
+               repeat('lorem ipsum ', 20),
+               (ARRAY['twitter','linkedin','instagram'])[1 + g % 3],
+               CASE WHEN g % 100 = 0 THEN 'draft' WHEN g % 25 = 0 THEN 'failed' ELSE 'posted' END,
+               now() - (g % 525600) * interval '1 minute' + interval '30 minutes',
+               CASE WHEN g % 100 = 0 OR g % 25 = 0 THEN NULL
+                    ELSE now() - (g % 525600) * interval '1 minute' END,
+               now() - (g % 525600) * interval '1 minute'
+        FROM generate_series(1, :rows) AS g
+    """,
+    "metrics": """
+        INSERT INTO metrics (post_id, platform, likes, shares, comments, clicks, engagement_rate, measured_at)
+        SELECT 1 + (g::bigint * 7919) % :rows,
+               (ARRAY['twitter','linkedin','instagram'])[1 + g % 3],
+               g % 60, g % 15, g % 9, g % 20,
+               (g % 1000) / 100.0,
+               now() - (g % 525600) * interval '1 minute'
+        FROM generate_series(1, :rows) AS g
+    """,
+    "agent_logs": """
+        INSERT INTO agent_logs (agent_name, action, data, success, created_at)
+        SELECT (ARRAY['trend_watcher','content_crafter','post_scheduler','engagement_monitor','strategy_optimizer'])[1 + g % 5],
+               'tick', '{}'::json, g % 50 <> 0,
+               now() - (g % 525600) * interval '1 minute'
+        FROM generate_series(1, :rows) AS g
+    """,
+    "trends": """
+        INSERT INTO trends (topic, platform, volume, sentiment, growth, bucket, created_at)
+        SELECT '#topic' || (g % 5000),
+               (ARRAY['twitter','linkedin','instagram','tiktok','youtube','reddit'])[1 + g % 6],
+               g % 20000, 'neutral', (g % 35) - 10,
+               date_trunc('hour', now() - (g % 525600) * interval '1 minute'),
+               now() - (g % 525600) * interval '1 minute'
+        FROM generate_series(1, :rows) AS g
+    """,
+}
+
+HOT_QUERIES = {
+    "schedule_pending_posts": """
+        SELECT * FROM posts WHERE status = 'draft' AND scheduled_for <= now()
+    """,
+    "check_engagement": """
+        SELECT * FROM posts WHERE status = 'posted' AND posted_at >= date_trunc('day', now())
+    """,
+    "agent_status (per agent)": """
+        SELECT * FROM agent_logs WHERE agent_name = 'content_crafter' ORDER BY created_at DESC LIMIT 1
+    """,
+    "agent status board": """
+        SELECT agents.agent_name, latest.* FROM (VALUES ('trend_watcher'), ('content_crafter'),
+            ('post_scheduler'), ('engagement_monitor'), ('strategy_optimizer')) AS agents (agent_name)
+        LEFT JOIN LATERAL (SELECT action, success, created_at FROM agent_logs
+            WHERE agent_logs.agent_name = agents.agent_name ORDER BY created_at DESC LIMIT 1) AS latest ON true
+    """,
+    "optimize_strategy latest": """
+        SELECT posts.id, latest.engagement_rate FROM posts
+        CROSS JOIN LATERAL (SELECT engagement_rate FROM metrics WHERE metrics.post_id = posts.id
+            ORDER BY measured_at DESC LIMIT 1) AS latest
+        WHERE posts.status = 'posted' AND posts.posted_at >= now() - interval '24 hours'
+        AND latest.engagement_rate < 2.0
+        AND NOT EXISTS (SELECT 1 FROM posts rewrite WHERE rewrite.parent_id = posts.id
+            AND rewrite.status IN ('draft', 'scheduled', 'posted'))
+    """,
+    "content dedup lookup": """
+        SELECT id FROM posts WHERE topic = '#topic42' AND platform = 'twitter'
+        AND created_at >= now() - interval '1 hour' LIMIT 1
+    """,
+    "get_current_trends": """
+        SELECT * FROM trends ORDER BY created_at DESC, id DESC LIMIT 21
+    """,
+    "drafts deep keyset page": """
+        SELECT * FROM posts WHERE status = 'draft' AND (created_at, id) < (now() - interval '300 days', 0)
+        ORDER BY created_at DESC, id DESC LIMIT 21
+    """,
+    "posts keyset page": """
+        SELECT * FROM posts WHERE status IN ('scheduled', 'posted') AND (created_at, id) < (now() - interval '300 days', 0)
+        ORDER BY created_at DESC, id DESC LIMIT 21
+    """,
+    "metrics keyset page (platform)": """
+        SELECT * FROM metrics WHERE platform = 'linkedin' AND (measured_at, id) < (now() - interval '300 days', 0)
+        ORDER BY measured_at DESC, id DESC LIMIT 51
+    """,
+}
+
+
+def _schema_conn(conn):
+    return conn.execution_options(schema_translate_map={None: SCHEMA})
+
+
+def setup_schema(rows: int):
+    with get_engine().begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        scoped = _schema_conn(conn)
+        # Tables only: indexes (other than primary keys) are added in build_indexes()
+        for table in Base.metadata.sorted_tables:
+            scoped.execute(CreateTable(table, include_foreign_key_constraints=[]))
+            if table.dialect_options["postgresql"]["partition_by"]:
+                # A single catch-all partition keeps the comparison about indexes, not pruning
+                conn.execute(text(f"CREATE TABLE {SCHEMA}.{table.name}_default PARTITION OF {SCHEMA}.{table.name} DEFAULT"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        for table, sql in SEED_SQL.items():
+            started = time.perf_counter()
+            conn.execute(text(sql), {"rows": rows})
+            print(f"  seeded {table:<11} {rows:>12,} rows in {time.perf_counter() - started:6.1f}s")
+        conn.execute(text("SET search_path TO public"))
+    analyze()
+
+
+def build_indexes():
+    with get_engine().begin() as conn:
+        scoped = _schema_conn(conn)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                scoped.execute(CreateIndex(index))
+    analyze()
+
+
+def analyze():
+    with get_engine().begin() as conn:
+        for table in SEED_SQL:
+            conn.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+
+
+def explain_all() -> dict:
+    results = {}
+    with get_engine().connect() as conn:
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        for name, sql in HOT_QUERIES.items():
+            plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).scalar()[0]
+            results[name] = plan
+        conn.execute(text("SET search_path TO public"))
+    return results
+
+
+def _plan_nodes(node, depth=0):
+    yield depth, node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child, depth + 1)
+
+
+def print_plan(plan: dict):
+    for depth, node in _plan_nodes(plan["Plan"]):
+        relation = node.get("Relation Name") or node.get("Index Name") or ""
+        print(f"      {'  ' * depth}-> {node['Node Type']} {relation} (rows={node.get('Actual Rows')})")
+
+
+def run(rows: int, show_plans: bool):
+    print(f"\n=== {rows:,} rows per table ===")
+    setup_schema(rows)
+    before = explain_all()
+    build_indexes()
+    after = explain_all()
+
+    print(f"\n  {'query':<28} {'no index (ms)':>14} {'indexed (ms)':>14} {'speedup':>9}")
+    for name in HOT_QUERIES:
+        slow = before[name]["Execution Time"]
+        fast = after[name]["Execution Time"]
+        print(f"  {name:<28} {slow:>14.2f} {fast:>14.2f} {slow / max(fast, 0.001):>8.1f}x")
+        if show_plans:
+            print("    before:")
+            print_plan(before[name])
+            print("    after:")
+            print_plan(after[name])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--plans", action="store_true", help="print the plan tree for every query")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    try:
+        for rows in args.rows:
+            run(rows, args.plans)
+    finally:
+        if not args.keep:
+            with get_engine().begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,18 @@ Initialize sample data for TrendPulse application
 Run this script to populate the database with sample trends, posts, and metrics
 """
 
-from database import SessionLocal, engine
-from models import Base, Trend, Post, Metrics, AgentLog
+from alembic import command
+from alembic.config import Config
+from database import SessionLocal
+from models import Trend, Post, Metrics, AgentLog
 from datetime import datetime, timedelta
+import os
 import random
 
 def init_sample_data():
     """Initialize sample data for testing"""
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+    # Bring the schema up to date
+    command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
     
     db = SessionLocal()
     try:
@@ -1,20 +1,28 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from celery import Celery
 import os
 from dotenv import load_dotenv
-from database import engine, Base, SessionLocal
+from database import SessionLocal, pool_status
 from models import Trend, Post, Metrics, AgentLog
 from agents import trend_watcher, content_crafter, post_scheduler, engagement_monitor, strategy_optimizer
 from services.social_media_service import social_media_service
+from services.http_client import http_client
+from services.trend_cache import trend_cache
+from services.agent_status import agent_status_board
+from services.response_cache import response_cache
+from services.generation_cache import generation_cache
+from services.rate_limiter import INTERACTIVE, llm_priority, openai_rate_limiter
+from services.model_router import llm_latency_budget, model_router
+from services.pagination import MAX_PAGE_SIZE, decode_cursor, parse_fields
 import json
-from typing import List
 from datetime import datetime
+from typing import Dict, List, Optional
 
 load_dotenv()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Schema is managed by Alembic (backend/migrations); run `alembic upgrade head` before starting
 
 # FastAPI app
 app = FastAPI(title="TrendPulse Multi-Agent Backend")
@@ -25,14 +33,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
 # Celery setup
 celery = Celery(
     "trendpulse",
     broker=os.getenv("REDIS_URL", "redis://localhost:6380/0"),
     backend=os.getenv("REDIS_URL", "redis://localhost:6380/0"),
-    include=["agents.trend_watcher", "agents.content_crafter", "agents.post_scheduler", "agents.engagement_monitor", "agents.strategy_optimizer"]
+    include=["agents.trend_watcher", "agents.content_crafter", "agents.post_scheduler", "agents.engagement_monitor", "agents.strategy_optimizer", "agents.retention"]
 )
 
 # WebSocket connection manager
@@ -66,82 +79,136 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
+# Read endpoints use the asyncpg engine so slow queries don't block the event loop.
+# Endpoints that still call blocking code (LLM, platform APIs, sync ORM) are plain
+# `def` so FastAPI runs them in its threadpool. Dashboard reads are served from the
+# Redis response cache, which the agents refresh whenever they commit new data.
+def list_filters(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    platform: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields, e.g. id,topic,status"),
+) -> Dict:
+    """Keyset pagination and filter parameters shared by the list endpoints.
+
+    Lists are newest first; when there are more rows the response carries an
+    X-Next-Cursor header to pass back as ?cursor= for the next page.
+    """
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    filters = {"limit": limit, "cursor": cursor, "platform": platform, "since": since, "until": until, "fields": fields}
+    return {name: value for name, value in filters.items() if value is not None}
+
+async def _cached_page(endpoint: str, loader, filters: Dict, response: Response, available_fields: Dict):
+    if "fields" in filters:
+        # Canonical list, so ?fields=a,b and ?fields=b,a share a cache entry
+        try:
+            filters["fields"] = parse_fields(filters["fields"], available_fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    page = await response_cache.get_or_load(endpoint, lambda: loader(**filters), params=filters)
+    if page["nextCursor"]:
+        response.headers["X-Next-Cursor"] = page["nextCursor"]
+    return page["data"]
+
 @app.get("/api/trends")
-async def get_trends():
-    return trend_watcher.get_current_trends()
+async def get_trends(response: Response, filters: Dict = Depends(list_filters), topic: Optional[str] = None):
+    if topic:
+        filters["topic"] = topic
+    return await _cached_page(
+        "trends", trend_watcher.get_current_trends_async, filters, response, trend_watcher.TREND_FIELDS
+    )
 
 @app.get("/api/drafts")
-async def get_drafts():
-    return content_crafter.get_current_drafts()
+async def get_drafts(response: Response, filters: Dict = Depends(list_filters), topic: Optional[str] = None):
+    if topic:
+        filters["topic"] = topic
+    return await _cached_page(
+        "drafts", content_crafter.get_current_drafts_async, filters, response, content_crafter.DRAFT_FIELDS
+    )
 
 @app.get("/api/posts")
-async def get_posts():
-    return post_scheduler.get_scheduled_posts()
+async def get_posts(response: Response, filters: Dict = Depends(list_filters), topic: Optional[str] = None,
+                    status: Optional[str] = None):
+    """Scheduled and posted posts; ?status= lists any other status (e.g. failed) instead"""
+    filters.update({name: value for name, value in {"topic": topic, "status": status}.items() if value})
+    return await _cached_page(
+        "posts", post_scheduler.get_scheduled_posts_async, filters, response, post_scheduler.SCHEDULED_POST_FIELDS
+    )
 
 @app.get("/api/metrics")
-async def get_metrics():
-    return engagement_monitor.get_engagement_metrics()
+async def get_metrics(response: Response, filters: Dict = Depends(list_filters), post_id: Optional[int] = None):
+    if post_id is not None:
+        filters["post_id"] = post_id
+    return await _cached_page(
+        "metrics", engagement_monitor.get_engagement_metrics_async, filters, response, engagement_monitor.METRIC_FIELDS
+    )
 
 @app.get("/api/agents/status")
 async def get_agent_status():
     """Get real agent status from database logs"""
-    db = SessionLocal()
-    try:
-        # Get the most recent log for each agent
-        agents = ["trend_watcher", "content_crafter", "post_scheduler", "engagement_monitor", "strategy_optimizer"]
-        status_data = {}
-        
-        for agent in agents:
-            latest_log = db.query(AgentLog).filter(
-                AgentLog.agent_name == agent
-            ).order_by(AgentLog.created_at.desc()).first()
-            
-            if latest_log:
-                # Calculate time since last run
-                time_diff = datetime.utcnow() - latest_log.created_at
-                if time_diff.total_seconds() < 300:  # 5 minutes
-                    last_run = f"{int(time_diff.total_seconds() / 60)} minutes ago"
-                elif time_diff.total_seconds() < 3600:  # 1 hour
-                    last_run = f"{int(time_diff.total_seconds() / 60)} minutes ago"
-                else:
-                    last_run = f"{int(time_diff.total_seconds() / 3600)} hours ago"
-                
-                status_data[agent] = {
-                    "status": "active" if latest_log.success else "error",
-                    "last_run": last_run,
-                    "success": latest_log.success,
-                    "last_action": latest_log.action
-                }
-            else:
-                status_data[agent] = {
-                    "status": "inactive",
-                    "last_run": "Never",
-                    "success": False,
-                    "last_action": "None"
-                }
-        
-        return status_data
-    finally:
-        db.close()
+    return await agent_status_board.get_status_async()
+
+def _latency_budget(request: dict) -> Optional[float]:
+    budget = request.get("latency_budget")
+    return float(budget) if budget is not None else None
 
 @app.post("/api/generate-content")
-async def generate_content(request: dict):
-    """Generate content for a specific topic"""
+def generate_content(request: dict):
+    """Generate content for a specific topic.
+
+    {"force_refresh": true} skips the generation cache; {"latency_budget": 8}
+    caps the seconds each generation may spend across its model cascade.
+    """
+    topic = request.get("topic")
+    if not topic:
+        return {"error": "Topic is required"}
+    
+    # Someone is waiting on this one: it goes ahead of the agents' background generation
+    with llm_priority(INTERACTIVE), llm_latency_budget(_latency_budget(request)):
+        return content_crafter.generate_content_for_topic(topic, force_refresh=bool(request.get("force_refresh")))
+
+@app.post("/api/generate-content/stream")
+def generate_content_stream(request: dict):
+    """Generate content for a topic as Server-Sent Events.
+
+    Text is forwarded as it is generated ("token" events tagged with platform
+    and variant; a "reset" event means a fallback model replaces the variant's
+    text so far); each variant is saved as a draft the moment it completes
+    ("draft" event with its id), and a final "done" event carries the counts.
+    """
     topic = request.get("topic")
     if not topic:
         return {"error": "Topic is required"}
     
-    return content_crafter.generate_content_for_topic(topic)
+    with llm_priority(INTERACTIVE), llm_latency_budget(_latency_budget(request)):
+        events = content_crafter.stream_content_for_topic(topic, force_refresh=bool(request.get("force_refresh")))
+    
+    def sse():
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        # Stop proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/api/schedule-post")
-async def schedule_post(post_data: dict):
+def schedule_post(post_data: dict):
     """Schedule a new post"""
     return post_scheduler.schedule_post(post_data)
 
 @app.get("/api/agents/insights")
 async def get_agent_insights():
     """Get strategy optimization insights"""
-    return strategy_optimizer.get_optimization_insights()
+    return await response_cache.get_or_load("insights", strategy_optimizer.get_optimization_insights_async)
 
 # Social Media endpoints
 @app.get("/api/social/status")
@@ -150,8 +217,8 @@ async def social_media_status():
     return social_media_service.get_platform_status()
 
 @app.post("/api/social/post")
-async def post_to_social_media(request: dict):
-    """Post content to social media platforms"""
+def post_to_social_media(request: dict):
+    """Post content to social media platforms concurrently; each platform's result has its latency_ms"""
     content = request.get("content")
     platforms = request.get("platforms", ["twitter", "linkedin", "instagram"])
     
@@ -162,9 +229,56 @@ async def post_to_social_media(request: dict):
     return results
 
 @app.get("/api/social/trends")
-async def get_social_trends():
-    """Get trending topics from all social media platforms"""
-    return social_media_service.get_all_trending_topics()
+async def get_social_trends(response: Response, details: bool = False):
+    """Get trending topics from all social media platforms.
+
+    Served from the trend cache the watcher fills; stale platforms are
+    refreshed in the background. Server-Timing reports each platform's cache
+    state and last fetch latency; ?details=true returns the per-platform report
+    (state, age, topic counts, errors) along with the topics.
+    """
+    report = await trend_cache.get_async()
+    response.headers["Server-Timing"] = ", ".join(
+        f"{platform};desc={outcome['state']};dur={outcome.get('latency_ms') or 0}"
+        for platform, outcome in report["platforms"].items()
+    )
+    return report if details else report["topics"]
+
+# System endpoints
+@app.get("/api/system/pool")
+async def get_pool_status():
+    """Database connection pool usage and checkout wait times for this process"""
+    return pool_status()
+
+@app.get("/api/system/cache")
+async def get_cache_stats():
+    """Response cache hit/miss counters for this process"""
+    return response_cache.stats()
+
+@app.get("/api/system/generation-cache")
+async def get_generation_cache_stats():
+    """LLM generation cache hits, misses and evictions across all processes"""
+    return generation_cache.stats()
+
+@app.get("/api/system/rate-limit")
+async def get_rate_limit_status():
+    """Shared OpenAI request/token bucket levels"""
+    return openai_rate_limiter.status()
+
+@app.get("/api/system/models")
+async def get_model_stats():
+    """Model cascades per task type, with per-model latency, tokens, timeouts and escalations"""
+    return model_router.stats()
+
+@app.get("/api/system/trend-cache")
+async def get_trend_cache_stats():
+    """Trend cache freshness and hit counters for this process"""
+    return trend_cache.stats()
+
+@app.get("/api/system/http")
+async def get_http_stats():
+    """Platform API connection pools and per-host request stats for this process"""
+    return http_client.stats()
 
 # Celery beat schedule
 celery.conf.beat_schedule = {
@@ -188,6 +302,10 @@ celery.conf.beat_schedule = {
         'task': 'agents.strategy_optimizer.optimize_strategy',
         'schedule': 600.0,  # Every 10 minutes
     },
+    'enforce-retention': {
+        'task': 'agents.retention.enforce_retention',
+        'schedule': 86400.0,  # Daily
+    },
 }
 celery.conf.timezone = 'UTC'
 
@@ -0,0 +1,99 @@
+"""baseline schema
+
+The tables exactly as Base.metadata.create_all() used to build them. Databases
+that were created that way already have them, so existing tables are left
+alone and the revision is simply recorded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_tables() -> set:
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    existing = _existing_tables()
+
+    if "trends" not in existing:
+        op.create_table(
+            "trends",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("topic", sa.String(), nullable=True),
+            sa.Column("platform", sa.String(), nullable=True),
+            sa.Column("volume", sa.Integer(), nullable=True),
+            sa.Column("sentiment", sa.String(), nullable=True),
+            sa.Column("growth", sa.Float(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_trends_id", "trends", ["id"])
+        op.create_index("ix_trends_topic", "trends", ["topic"])
+
+    if "posts" not in existing:
+        op.create_table(
+            "posts",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("topic", sa.String(), nullable=True),
+            sa.Column("content", sa.Text(), nullable=True),
+            sa.Column("platform", sa.String(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("scheduled_for", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("posted_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("buffer_id", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_posts_id", "posts", ["id"])
+
+    if "metrics" not in existing:
+        op.create_table(
+            "metrics",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("post_id", sa.Integer(), nullable=True),
+            sa.Column("platform", sa.String(), nullable=True),
+            sa.Column("likes", sa.Integer(), nullable=True),
+            sa.Column("shares", sa.Integer(), nullable=True),
+            sa.Column("comments", sa.Integer(), nullable=True),
+            sa.Column("clicks", sa.Integer(), nullable=True),
+            sa.Column("engagement_rate", sa.Float(), nullable=True),
+            sa.Column("measured_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_metrics_id", "metrics", ["id"])
+
+    if "agent_logs" not in existing:
+        op.create_table(
+            "agent_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("agent_name", sa.String(), nullable=True),
+            sa.Column("action", sa.String(), nullable=True),
+            sa.Column("data", sa.JSON(), nullable=True),
+            sa.Column("success", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_agent_logs_id", "agent_logs", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("agent_logs")
+    op.drop_table("metrics")
+    op.drop_table("posts")
+    op.drop_table("trends")
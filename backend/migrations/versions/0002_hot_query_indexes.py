@@ -0,0 +1,94 @@
+"""indexes for the agents' hot query shapes
+
+- posts: partial indexes for the scheduler (drafts due) and the engagement
+  monitor / optimizer (posted since a cutoff), plus the content crafter's
+  topic + platform dedup lookup
+- metrics: post_id index and a real foreign key to posts (rows whose post
+  is gone are moved to metrics_orphaned first, so an operator can decide
+  what to keep)
+- agent_logs: (agent_name, created_at) for the per-agent latest-row lookups
+- trends / metrics: created_at / measured_at for the "newest N" dashboard reads
+
+Indexes are built CONCURRENTLY so the beat tasks keep writing while this runs.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:05:00
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_posts_draft_scheduled_for", "posts", ["scheduled_for"], "status = 'draft'"),
+    ("ix_posts_posted_posted_at", "posts", ["posted_at"], "status = 'posted'"),
+    ("ix_posts_topic_platform_created_at", "posts", ["topic", "platform", "created_at"], None),
+    ("ix_metrics_post_id_measured_at", "metrics", ["post_id", "measured_at"], None),
+    ("ix_metrics_measured_at", "metrics", ["measured_at"], None),
+    ("ix_agent_logs_agent_name_created_at", "agent_logs", ["agent_name", "created_at"], None),
+    ("ix_trends_created_at", "trends", ["created_at"], None),
+]
+
+MOVE_ORPHANS = """
+WITH orphans AS (
+    DELETE FROM metrics m
+    WHERE m.post_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM posts p WHERE p.id = m.post_id)
+    RETURNING m.*
+)
+INSERT INTO metrics_orphaned SELECT * FROM orphans
+"""
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+    # Metrics rows whose post is gone would fail the foreign key; keep them
+    # aside in metrics_orphaned rather than deleting them.
+    op.execute("CREATE TABLE IF NOT EXISTS metrics_orphaned (LIKE metrics INCLUDING DEFAULTS)")
+    if op.get_context().as_sql:
+        op.execute(MOVE_ORPHANS)
+    else:
+        moved = op.get_bind().execute(sa.text(MOVE_ORPHANS)).rowcount
+        if moved:
+            logger.warning("Moved %d metrics rows without a post to metrics_orphaned", moved)
+
+    # NOT VALID skips the scan, so ADD CONSTRAINT's lock is brief; VALIDATE then
+    # checks existing rows in its own transaction under a weaker lock that
+    # doesn't block writes.
+    op.execute(
+        "ALTER TABLE metrics ADD CONSTRAINT fk_metrics_post_id_posts "
+        "FOREIGN KEY (post_id) REFERENCES posts (id) ON DELETE CASCADE NOT VALID"
+    )
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE metrics VALIDATE CONSTRAINT fk_metrics_post_id_posts")
+
+
+def downgrade() -> None:
+    op.drop_constraint("fk_metrics_post_id_posts", "metrics", type_="foreignkey")
+    op.execute("INSERT INTO metrics SELECT * FROM metrics_orphaned")
+    op.drop_table("metrics_orphaned")
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
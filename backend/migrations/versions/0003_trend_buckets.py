@@ -0,0 +1,59 @@
+"""one trend row per (topic, platform, time bucket)
+
+Adds trends.bucket / trends.updated_at, folds existing duplicate sightings
+into the newest row of each hourly bucket and adds the unique key used by
+monitor_trends' upsert.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("trends", sa.Column("bucket", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("trends", sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True))
+
+    op.execute("UPDATE trends SET bucket = date_trunc('hour', coalesce(created_at, now())), updated_at = created_at")
+
+    # Keep the newest sighting per key
+    op.execute(
+        """
+        DELETE FROM trends t
+        USING trends newer
+        WHERE newer.topic IS NOT DISTINCT FROM t.topic
+          AND newer.platform IS NOT DISTINCT FROM t.platform
+          AND newer.bucket = t.bucket
+          AND newer.id > t.id
+        """
+    )
+
+    op.alter_column("trends", "bucket", nullable=False, server_default=sa.text("date_trunc('hour', now())"))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_trends_topic_platform_bucket",
+            "trends",
+            ["topic", "platform", "bucket"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_trends_topic_platform_bucket", table_name="trends")
+    op.drop_column("trends", "updated_at")
+    op.drop_column("trends", "bucket")
@@ -0,0 +1,77 @@
+"""hourly and daily engagement rollups
+
+Per-post engagement gained per hour / day, kept up to date by check_engagement
+so the dashboard summary never has to scan the raw metrics table. Metrics
+snapshots carry running totals, so buckets hold the change since the post's
+previous snapshot. Existing metrics are folded in once here.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 09:15:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ROLLUPS = {
+    "engagement_rollups_hourly": "hour",
+    "engagement_rollups_daily": "day",
+}
+
+
+def upgrade() -> None:
+    for table, unit in ROLLUPS.items():
+        op.create_table(
+            table,
+            sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("post_id", sa.Integer(), nullable=False),
+            sa.Column("platform", sa.String(), nullable=True),
+            sa.Column("topic", sa.String(), nullable=True),
+            sa.Column("samples", sa.Integer(), nullable=False),
+            sa.Column("likes", sa.BigInteger(), nullable=False),
+            sa.Column("shares", sa.BigInteger(), nullable=False),
+            sa.Column("comments", sa.BigInteger(), nullable=False),
+            sa.Column("clicks", sa.BigInteger(), nullable=False),
+            sa.Column("engagement_rate_sum", sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(["post_id"], ["posts.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("bucket", "post_id"),
+        )
+        op.create_index(f"ix_{table}_platform_bucket", table, ["platform", "bucket"])
+        op.create_index(f"ix_{table}_topic_bucket", table, ["topic", "bucket"])
+
+        op.execute(
+            f"""
+            INSERT INTO {table} (bucket, post_id, platform, topic, samples, likes, shares, comments, clicks, engagement_rate_sum)
+            SELECT date_trunc('{unit}', d.measured_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+                   d.post_id, p.platform, p.topic, count(*),
+                   sum(d.likes), sum(d.shares), sum(d.comments), sum(d.clicks),
+                   coalesce(sum(d.engagement_rate), 0)
+            FROM (
+                SELECT m.post_id, m.measured_at, m.engagement_rate,
+                       coalesce(m.likes, 0) - lag(coalesce(m.likes, 0), 1, 0) OVER w AS likes,
+                       coalesce(m.shares, 0) - lag(coalesce(m.shares, 0), 1, 0) OVER w AS shares,
+                       coalesce(m.comments, 0) - lag(coalesce(m.comments, 0), 1, 0) OVER w AS comments,
+                       coalesce(m.clicks, 0) - lag(coalesce(m.clicks, 0), 1, 0) OVER w AS clicks
+                FROM metrics m
+                WHERE m.measured_at IS NOT NULL
+                WINDOW w AS (PARTITION BY m.post_id ORDER BY m.measured_at, m.id)
+            ) d
+            JOIN posts p ON p.id = d.post_id
+            GROUP BY 1, d.post_id, p.platform, p.topic
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in ROLLUPS:
+        op.drop_table(table)
@@ -0,0 +1,133 @@
+"""range-partition trends, metrics and agent_logs by month
+
+Each table is rebuilt as a RANGE-partitioned parent (trends on bucket,
+metrics on measured_at, agent_logs on created_at) with one partition per
+month from the oldest row up to three months ahead, plus a DEFAULT partition
+as a safety net. The primary keys become (id, <partition key>) because
+Postgres requires the partition key in every unique constraint.
+
+Rows are copied table by table while holding an exclusive lock, so run this
+in a maintenance window on large databases. Afterwards agents/retention.py
+keeps future partitions created and archives expired ones.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 09:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 3
+
+TABLES = {
+    "trends": {
+        "key": "bucket",
+        "indexes": [
+            "CREATE INDEX ix_trends_id ON trends (id)",
+            "CREATE INDEX ix_trends_topic ON trends (topic)",
+            "CREATE INDEX ix_trends_created_at ON trends (created_at)",
+            "CREATE UNIQUE INDEX uq_trends_topic_platform_bucket ON trends (topic, platform, bucket)",
+        ],
+        "constraints": [],
+    },
+    "metrics": {
+        "key": "measured_at",
+        "indexes": [
+            "CREATE INDEX ix_metrics_id ON metrics (id)",
+            "CREATE INDEX ix_metrics_post_id_measured_at ON metrics (post_id, measured_at)",
+            "CREATE INDEX ix_metrics_measured_at ON metrics (measured_at)",
+        ],
+        "constraints": [
+            "ALTER TABLE metrics ADD CONSTRAINT fk_metrics_post_id_posts "
+            "FOREIGN KEY (post_id) REFERENCES posts (id) ON DELETE CASCADE",
+        ],
+    },
+    "agent_logs": {
+        "key": "created_at",
+        "indexes": [
+            "CREATE INDEX ix_agent_logs_id ON agent_logs (id)",
+            "CREATE INDEX ix_agent_logs_agent_name_created_at ON agent_logs (agent_name, created_at)",
+        ],
+        "constraints": [],
+    },
+}
+
+
+def _index_names(table: str) -> str:
+    return ", ".join(sql.split(" ON ")[0].split()[-1] for sql in TABLES[table]["indexes"])
+
+
+def _detach_old(table: str):
+    """Rename the current table out of the way and free its index / constraint names"""
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    op.execute(f"ALTER TABLE {table}_old DROP CONSTRAINT IF EXISTS {table}_pkey")
+    op.execute(f"ALTER TABLE {table}_old DROP CONSTRAINT IF EXISTS fk_metrics_post_id_posts")
+    op.execute(f"DROP INDEX IF EXISTS {_index_names(table)}")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+
+
+def _finish(table: str):
+    """Copy rows over, drop the old table and rebuild indexes / constraints"""
+    op.execute(f"INSERT INTO {table} SELECT * FROM {table}_old")
+    op.execute(f"DROP TABLE {table}_old")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    for sql in TABLES[table]["indexes"]:
+        op.execute(sql)
+    for sql in TABLES[table]["constraints"]:
+        op.execute(sql)
+
+
+def upgrade() -> None:
+    for table, spec in TABLES.items():
+        key = spec["key"]
+
+        # The partition key cannot be NULL
+        op.execute(f"UPDATE {table} SET {key} = now() WHERE {key} IS NULL")
+
+        _detach_old(table)
+
+        op.execute(f"CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS) PARTITION BY RANGE ({key})")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {key} SET NOT NULL")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {key})")
+
+        # Monthly partitions (bounds in UTC) from the oldest row to MONTHS_AHEAD months out
+        op.execute(
+            f"""
+            DO $$
+            DECLARE
+                month_start timestamp := date_trunc('month', coalesce((SELECT min({key}) FROM {table}_old), now()) AT TIME ZONE 'UTC');
+                last_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{MONTHS_AHEAD} months';
+            BEGIN
+                WHILE month_start <= last_month LOOP
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                        '{table}_p' || to_char(month_start, 'YYYY_MM'),
+                        (month_start AT TIME ZONE 'UTC'),
+                        ((month_start + interval '1 month') AT TIME ZONE 'UTC')
+                    );
+                    month_start := month_start + interval '1 month';
+                END LOOP;
+            END $$
+            """
+        )
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+        _finish(table)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        _detach_old(table)
+        op.execute(f"CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS)")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        _finish(table)
@@ -0,0 +1,97 @@
+"""indexes for keyset pagination of the list endpoints
+
+Every list endpoint pages newest first on (created_at, id) - (measured_at, id)
+for metrics - so each page is one index range scan starting at the cursor:
+
+- trends: (created_at, id) replaces (created_at); (platform, created_at, id)
+- posts: (status, created_at, id) and (status, platform, created_at, id) for
+  drafts / ?status=, plus a partial (created_at, id) for scheduled + posted
+- metrics: (measured_at, id) replaces (measured_at); (platform, measured_at, id)
+
+posts is built CONCURRENTLY. trends and metrics are partitioned, where Postgres
+can't build a parent index concurrently, so the parent index is created ON ONLY
+(invalid, no data), each partition's index is built concurrently and attached,
+and the parent becomes valid once every partition has one.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 09:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+POST_INDEXES = [
+    ("ix_posts_status_created_at_id", ["status", "created_at", "id"], None),
+    ("ix_posts_status_platform_created_at_id", ["status", "platform", "created_at", "id"], None),
+    ("ix_posts_published_created_at_id", ["created_at", "id"], "status IN ('scheduled', 'posted')"),
+]
+
+# (name, table, columns, index it supersedes)
+PARTITIONED_INDEXES = [
+    ("ix_trends_created_at_id", "trends", ["created_at", "id"], ("ix_trends_created_at", ["created_at"])),
+    ("ix_trends_platform_created_at_id", "trends", ["platform", "created_at", "id"], None),
+    ("ix_metrics_measured_at_id", "metrics", ["measured_at", "id"], ("ix_metrics_measured_at", ["measured_at"])),
+    ("ix_metrics_platform_measured_at_id", "metrics", ["platform", "measured_at", "id"], None),
+]
+
+
+def _partitions(table: str):
+    return op.get_bind().execute(
+        sa.text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table ORDER BY child.relname"
+        ),
+        {"table": table},
+    ).scalars().all()
+
+
+def _create_partitioned_index(name: str, table: str, columns):
+    column_list = ", ".join(columns)
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} ({column_list})")
+    for partition in _partitions(table):
+        partition_index = f"{partition}_{'_'.join(columns)}_idx"[:63]
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} ({column_list})")
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns, where in POST_INDEXES:
+            op.create_index(
+                name,
+                "posts",
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+        for name, table, columns, replaces in PARTITIONED_INDEXES:
+            _create_partitioned_index(name, table, columns)
+            if replaces:
+                # Partitioned indexes can't be dropped concurrently; this only takes a brief lock
+                op.execute(f"DROP INDEX IF EXISTS {replaces[0]}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, replaces in reversed(PARTITIONED_INDEXES):
+            if replaces:
+                _create_partitioned_index(replaces[0], table, replaces[1])
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+
+        for name, _, _ in reversed(POST_INDEXES):
+            op.drop_index(name, table_name="posts", postgresql_concurrently=True, if_exists=True)
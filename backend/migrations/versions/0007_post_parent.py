@@ -0,0 +1,88 @@
+"""posts.parent_id links optimized rewrites to the post they rewrite
+
+optimize_strategy skips posts that already have a live rewrite, found through
+a partial (parent_id, status) index. The column and a NOT VALID foreign key
+are committed first; the constraint is validated afterwards in its own
+transaction so the table is not locked while it is checked. Existing
+" (Optimized)" posts are linked, in batches, to the newest earlier post with
+the original topic on the same platform, so they count from the first run.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 5000
+
+# Links one batch of " (Optimized)" posts (by id, after :after) to the post they rewrite
+LINK_REWRITES = """
+UPDATE posts child SET parent_id = (
+    SELECT original.id FROM posts original
+    WHERE original.topic = left(child.topic, -length(' (Optimized)'))
+      AND original.platform = child.platform
+      AND original.created_at <= child.created_at
+    ORDER BY original.created_at DESC
+    LIMIT 1
+)
+WHERE child.id IN (
+    SELECT id FROM posts
+    WHERE topic LIKE '% (Optimized)' AND id > :after
+    ORDER BY id
+    LIMIT :batch_size
+)
+RETURNING child.id
+"""
+
+
+def upgrade() -> None:
+    # Column and NOT VALID constraint only need a brief lock; they commit on
+    # their own before the backfill and the validation below.
+    op.add_column("posts", sa.Column("parent_id", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "fk_posts_parent_id_posts", "posts", "posts", ["parent_id"], ["id"],
+        ondelete="SET NULL", postgresql_not_valid=True,
+    )
+
+    with op.get_context().autocommit_block():
+        # Each batch commits by itself, so row locks are held only briefly
+        if op.get_context().as_sql:
+            op.execute(sa.text(LINK_REWRITES).bindparams(after=0, batch_size=None))
+        else:
+            bind = op.get_bind()
+            after = 0
+            while True:
+                ids = bind.execute(sa.text(LINK_REWRITES), {"after": after, "batch_size": BATCH_SIZE}).scalars().all()
+                if not ids:
+                    break
+                after = max(ids)
+
+        op.execute("ALTER TABLE posts VALIDATE CONSTRAINT fk_posts_parent_id_posts")
+
+        op.create_index(
+            "ix_posts_parent_id_status",
+            "posts",
+            ["parent_id", "status"],
+            postgresql_where=sa.text("parent_id IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_posts_parent_id_status", table_name="posts", postgresql_concurrently=True, if_exists=True)
+    op.drop_constraint("fk_posts_parent_id_posts", "posts", type_="foreignkey")
+    op.drop_column("posts", "parent_id")
@@ -1,17 +1,31 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, Boolean, Text, JSON, ForeignKey, Index, text
+from sqlalchemy.orm import declared_attr
 from sqlalchemy.sql import func
 from database import Base
 
 class Trend(Base):
     __tablename__ = "trends"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     topic = Column(String, index=True)
     platform = Column(String)
     volume = Column(Integer)
     sentiment = Column(String)
     growth = Column(Float)
+    # Start of the time bucket this sighting belongs to; one row per (topic, platform, bucket)
+    bucket = Column(DateTime(timezone=True), primary_key=True, server_default=text("date_trunc('hour', now())"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # get_current_trends keyset pages (optionally per platform) / generate_content_for_trends
+        Index("ix_trends_created_at_id", "created_at", "id"),
+        Index("ix_trends_platform_created_at_id", "platform", "created_at", "id"),
+        # upsert key for monitor_trends
+        Index("uq_trends_topic_platform_bucket", "topic", "platform", "bucket", unique=True),
+        # monthly partitions, managed by agents/retention.py
+        {"postgresql_partition_by": "RANGE (bucket)"},
+    )
 
 class Post(Base):
     __tablename__ = "posts"
@@ -24,27 +38,92 @@ class Post(Base):
     scheduled_for = Column(DateTime(timezone=True))
     posted_at = Column(DateTime(timezone=True))
     buffer_id = Column(String)
+    # Post this one is an optimized rewrite of
+    parent_id = Column(Integer, ForeignKey("posts.id", ondelete="SET NULL", name="fk_posts_parent_id_posts"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # schedule_pending_posts: status = 'draft' AND scheduled_for <= now
+        Index("ix_posts_draft_scheduled_for", "scheduled_for", postgresql_where=text("status = 'draft'")),
+        # check_engagement / optimize_strategy: status = 'posted' AND posted_at >= cutoff
+        Index("ix_posts_posted_posted_at", "posted_at", postgresql_where=text("status = 'posted'")),
+        # generate_content_for_trends: topic + platform dedup within the last hour
+        Index("ix_posts_topic_platform_created_at", "topic", "platform", "created_at"),
+        # keyset pages of /api/drafts and /api/posts?status=, optionally per platform
+        Index("ix_posts_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_posts_status_platform_created_at_id", "status", "platform", "created_at", "id"),
+        # keyset pages of /api/posts (scheduled + posted)
+        Index(
+            "ix_posts_published_created_at_id", "created_at", "id",
+            postgresql_where=text("status IN ('scheduled', 'posted')"),
+        ),
+        # optimize_strategy: does this post already have an optimized rewrite?
+        Index("ix_posts_parent_id_status", "parent_id", "status", postgresql_where=text("parent_id IS NOT NULL")),
+    )
+
 class Metrics(Base):
     __tablename__ = "metrics"
     
-    id = Column(Integer, primary_key=True, index=True)
-    post_id = Column(Integer)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE", name="fk_metrics_post_id_posts"))
     platform = Column(String)
     likes = Column(Integer, default=0)
     shares = Column(Integer, default=0)
     comments = Column(Integer, default=0)
     clicks = Column(Integer, default=0)
     engagement_rate = Column(Float, default=0.0)
-    measured_at = Column(DateTime(timezone=True), server_default=func.now())
+    measured_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+
+    __table_args__ = (
+        # optimize_strategy joins on post_id; get_engagement_metrics keyset pages (optionally per platform)
+        Index("ix_metrics_post_id_measured_at", "post_id", "measured_at"),
+        Index("ix_metrics_measured_at_id", "measured_at", "id"),
+        Index("ix_metrics_platform_measured_at_id", "platform", "measured_at", "id"),
+        {"postgresql_partition_by": "RANGE (measured_at)"},
+    )
 
 class AgentLog(Base):
     __tablename__ = "agent_logs"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     agent_name = Column(String)
     action = Column(String)
     data = Column(JSON)
     success = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+
+    __table_args__ = (
+        # agent status / insights: latest rows for one agent
+        Index("ix_agent_logs_agent_name_created_at", "agent_name", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+class EngagementRollupMixin:
+    """Per-post engagement gained in one time bucket, maintained by check_engagement"""
+
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    platform = Column(String)
+    topic = Column(String)
+    samples = Column(Integer, nullable=False, default=0)
+    likes = Column(BigInteger, nullable=False, default=0)
+    shares = Column(BigInteger, nullable=False, default=0)
+    comments = Column(BigInteger, nullable=False, default=0)
+    clicks = Column(BigInteger, nullable=False, default=0)
+    engagement_rate_sum = Column(Float, nullable=False, default=0.0)
+
+    @declared_attr
+    def post_id(cls):
+        return Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            Index(f"ix_{cls.__tablename__}_platform_bucket", "platform", "bucket"),
+            Index(f"ix_{cls.__tablename__}_topic_bucket", "topic", "bucket"),
+        )
+
+class EngagementRollupHourly(EngagementRollupMixin, Base):
+    __tablename__ = "engagement_rollups_hourly"
+
+class EngagementRollupDaily(EngagementRollupMixin, Base):
+    __tablename__ = "engagement_rollups_daily"
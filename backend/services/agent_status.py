@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import String, column, event, select, true, values
+from sqlalchemy.orm import Session, object_session
+
+from database import SessionLocal, AsyncSessionLocal
+from models import AgentLog
+from services.redis_client import get_async_redis, get_redis, key
+
+AGENT_NAMES = ["trend_watcher", "content_crafter", "post_scheduler", "engagement_monitor", "strategy_optimizer"]
+
+def _aware(created_at: datetime) -> datetime:
+    return created_at.replace(tzinfo=timezone.utc) if created_at.tzinfo is None else created_at
+
+class AgentStatusBoard:
+    """Latest AgentLog per agent, read in a single query and cached in-process.
+
+    The cache expires after AGENT_STATUS_CACHE_TTL seconds. AgentLogs are
+    written by the Celery workers, so once a log commits its process also
+    stores it in a Redis hash (one field per agent); every read merges that
+    hash in, which shows a new log right away in the API process. Without
+    Redis the board only catches up when the cache expires.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = float(os.getenv("AGENT_STATUS_CACHE_TTL", "10")) if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._latest: Dict[str, Optional[Dict]] = {}
+        self._loaded_at = 0.0
+
+    def latest_logs_query(self):
+        """One round trip: a LATERAL probe of ix_agent_logs_agent_name_created_at per agent"""
+        agents = values(column("agent_name", String), name="agents").data([(name,) for name in AGENT_NAMES])
+        latest = (
+            select(AgentLog.action, AgentLog.success, AgentLog.created_at)
+            .where(AgentLog.agent_name == agents.c.agent_name)
+            .order_by(AgentLog.created_at.desc())
+            .limit(1)
+            .lateral("latest")
+        )
+        return (
+            select(agents.c.agent_name, latest.c.action, latest.c.success, latest.c.created_at)
+            .select_from(agents)
+            .outerjoin(latest, true())
+        )
+
+    def refresh(self):
+        db = SessionLocal()
+        try:
+            rows = db.execute(self.latest_logs_query()).all()
+        finally:
+            db.close()
+        self._store(rows)
+
+    async def refresh_async(self):
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(self.latest_logs_query())).all()
+        self._store(rows)
+
+    def _store(self, rows):
+        latest = {
+            row.agent_name: {"action": row.action, "success": row.success, "created_at": row.created_at}
+            if row.created_at is not None else None
+            for row in rows
+        }
+        with self._lock:
+            self._latest = latest
+            self._loaded_at = time.monotonic()
+
+    def record(self, agent_name: str, action: str, success: bool, created_at: Optional[datetime] = None):
+        """Apply a freshly written log without waiting for the TTL to expire"""
+        with self._lock:
+            self._latest[agent_name] = {
+                "action": action,
+                "success": success,
+                "created_at": created_at or datetime.now(timezone.utc),
+            }
+
+    def _latest_key(self) -> str:
+        return key("agents", "latest")
+
+    def publish(self, logs: Dict[str, Dict]):
+        """Record freshly committed logs here and in Redis for the other processes"""
+        for agent_name, log in logs.items():
+            self.record(agent_name, log["action"], log["success"], log["created_at"])
+        try:
+            get_redis().hset(self._latest_key(), mapping={
+                agent_name: json.dumps({**log, "created_at": log["created_at"].isoformat()})
+                for agent_name, log in logs.items()
+            })
+        except RedisError as e:
+            print(f"Agent status publish failed: {e}")
+
+    def _merge(self, published: Dict):
+        """Apply logs other processes published that are newer than what this process has"""
+        with self._lock:
+            for agent_name, value in published.items():
+                log = json.loads(value)
+                log["created_at"] = _aware(datetime.fromisoformat(log["created_at"]))
+                current = self._latest.get(agent_name.decode())
+                if current is None or _aware(current["created_at"]) < log["created_at"]:
+                    self._latest[agent_name.decode()] = log
+
+    def sync(self):
+        try:
+            self._merge(get_redis().hgetall(self._latest_key()))
+        except RedisError as e:
+            print(f"Agent status unavailable: {e}")
+
+    async def sync_async(self):
+        try:
+            self._merge(await get_async_redis().hgetall(self._latest_key()))
+        except RedisError as e:
+            print(f"Agent status unavailable: {e}")
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._loaded_at > self.ttl
+
+    def get_status(self) -> Dict:
+        if self._expired():
+            self.refresh()
+        self.sync()
+        return self._snapshot()
+
+    async def get_status_async(self) -> Dict:
+        if self._expired():
+            await self.refresh_async()
+        await self.sync_async()
+        return self._snapshot()
+
+    def _snapshot(self) -> Dict:
+        with self._lock:
+            latest = dict(self._latest)
+
+        return {agent: self._format_status(latest.get(agent)) for agent in AGENT_NAMES}
+
+    def _format_status(self, log: Optional[Dict]) -> Dict:
+        if not log:
+            return {
+                "status": "inactive",
+                "last_run": "Never",
+                "success": False,
+                "last_action": "None"
+            }
+
+        created_at = _aware(log["created_at"])
+
+        # Calculate time since last run
+        seconds = (datetime.now(timezone.utc) - created_at).total_seconds()
+        if seconds < 3600:
+            last_run = f"{int(seconds / 60)} minutes ago"
+        else:
+            last_run = f"{int(seconds / 3600)} hours ago"
+
+        return {
+            "status": "active" if log["success"] else "error",
+            "last_run": last_run,
+            "success": log["success"],
+            "last_action": log["action"]
+        }
+
+# Create global instance
+agent_status_board = AgentStatusBoard()
+
+@event.listens_for(AgentLog, "after_insert")
+def _record_agent_log(mapper, connection, target):
+    # created_at is a server default and not loaded yet; avoid a refresh inside the flush
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault("agent_logs", {})[target.agent_name] = {
+        "action": target.action,
+        "success": target.__dict__.get("success") is not False,
+        "created_at": target.__dict__.get("created_at") or datetime.now(timezone.utc),
+    }
+
+@event.listens_for(Session, "after_commit")
+def _publish_agent_logs(session):
+    logs = session.info.pop("agent_logs", None)
+    if logs:
+        agent_status_board.publish(logs)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_agent_logs(session):
+    session.info.pop("agent_logs", None)
@@ -0,0 +1,214 @@
+import hashlib
+import os
+import random
+import re
+import struct
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from models import Post
+from services.redis_client import get_redis, key
+
+# How far back existing posts count as "already written about"
+DEDUP_WINDOW_HOURS = float(os.getenv("DEDUP_WINDOW_HOURS", "24"))
+# Jaccard similarity of normalized topic tokens above which two topics are the same (1.0 = same tokens)
+DEDUP_TOPIC_THRESHOLD = float(os.getenv("DEDUP_TOPIC_THRESHOLD", "0.8"))
+# Estimated Jaccard similarity of post bodies (word 3-shingles) above which a draft is a duplicate
+DEDUP_CONTENT_THRESHOLD = float(os.getenv("DEDUP_CONTENT_THRESHOLD", "0.7"))
+
+# Every status a post can have; listed so the window query uses the (status, created_at) index
+DEDUP_STATUSES = ["draft", "scheduled", "posted", "failed"]
+
+STOP_WORDS = {"a", "an", "and", "at", "for", "in", "of", "on", "the", "to", "with"}
+# Suffixes agents add to topics that don't change what the post is about
+TOPIC_SUFFIXES = re.compile(r"(\s*\(optimized\))+\s*$", re.IGNORECASE)
+
+# MinHash signatures: NUM_PERM hash permutations, split into LSH bands of BAND_ROWS rows
+NUM_PERM = 32
+BAND_ROWS = 4
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20261017)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+def topic_tokens(topic: str) -> Set[str]:
+    """Normalized tokens of a topic: "#OpenAI", "open ai" and "OpenAI (Optimized)" all give {"open", "ai"}"""
+    topic = TOPIC_SUFFIXES.sub("", topic or "")
+    # Split camel-cased hashtags: "#MachineLearning" -> "Machine Learning"
+    topic = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", topic)
+    return {token for token in re.findall(r"[a-z0-9]+", topic.lower()) if token not in STOP_WORDS}
+
+def content_shingles(content: str, size: int = 3) -> Set[str]:
+    words = re.findall(r"[a-z0-9#@']+", (content or "").lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard(a: Set, b: Set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def minhash(shingles: Set[str]) -> List[int]:
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big") for shingle in shingles]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+class SignatureStore:
+    """MinHash signatures of stored posts' bodies, so each body is read and hashed once.
+
+    Signatures are kept in this process and in Redis (one key per post id, for
+    the dedup window plus an hour), shared by every API and worker process.
+    Only posts no process has seen yet have their content read. Posts without
+    usable content are stored with an empty signature so they aren't read
+    again. Without Redis signatures are only cached in the process.
+    """
+
+    def __init__(self, ttl: int = int(DEDUP_WINDOW_HOURS * 3600) + 3600):
+        self.ttl = ttl
+        self._local: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, post_id: int) -> str:
+        return key("dedup", "signature", post_id)
+
+    def _pack(self, signature: List[int]) -> bytes:
+        return struct.pack(f">{len(signature)}Q", *signature)
+
+    def _unpack(self, value: bytes) -> List[int]:
+        return list(struct.unpack(f">{len(value) // 8}Q", value))
+
+    def get_many(self, db, post_ids: List[int]) -> Dict[int, List[int]]:
+        """Signatures of `post_ids` ([] for posts without content); forgets posts not asked for any more"""
+        with self._lock:
+            local = {post_id: self._local[post_id] for post_id in post_ids if post_id in self._local}
+        missing = [post_id for post_id in post_ids if post_id not in local]
+
+        redis = None
+        if missing:
+            try:
+                redis = get_redis()
+                values = redis.mget([self._key(post_id) for post_id in missing])
+                local.update({post_id: self._unpack(value) for post_id, value in zip(missing, values) if value is not None})
+            except RedisError as e:
+                print(f"Dedup signatures unavailable: {e}")
+                redis = None
+            missing = [post_id for post_id in missing if post_id not in local]
+
+        if missing:
+            computed = {}
+            for row in db.execute(select(Post.id, Post.content).where(Post.id.in_(missing))).all():
+                shingles = content_shingles(row.content)
+                computed[row.id] = minhash(shingles) if shingles else []
+            local.update(computed)
+            if redis is not None and computed:
+                try:
+                    pipe = redis.pipeline(transaction=False)
+                    for post_id, signature in computed.items():
+                        pipe.set(self._key(post_id), self._pack(signature), ex=self.ttl)
+                    pipe.execute()
+                except RedisError as e:
+                    print(f"Dedup signature write failed: {e}")
+
+        # The window moved on: posts that left it are dropped from memory
+        with self._lock:
+            self._local = local
+        return local
+
+# Create global instance
+signature_store = SignatureStore()
+
+class DraftIndex:
+    """Similarity index over the topics and bodies of recent posts, per platform.
+
+    Topics match on the Jaccard similarity of their normalized tokens (through
+    an inverted token index). Bodies are MinHashed and bucketed with LSH, so a
+    lookup only compares against posts that share a band; candidates are then
+    confirmed on the estimated similarity. Built from the database for one
+    agent run with load() (bodies come from the shared SignatureStore); add()
+    what the run creates so it dedups against itself too.
+    """
+
+    def __init__(self, topic_threshold: float = DEDUP_TOPIC_THRESHOLD,
+                 content_threshold: float = DEDUP_CONTENT_THRESHOLD):
+        self.topic_threshold = topic_threshold
+        self.content_threshold = content_threshold
+        self._topics: Dict[str, Dict[int, Set[str]]] = {}
+        self._tokens: Dict[str, Dict[str, Set[int]]] = {}
+        self._status: Dict[int, str] = {}
+        self._signatures: Dict[int, List[int]] = {}
+        self._bands: Dict[tuple, Set[int]] = {}
+        self._next_pending = -1
+
+    @classmethod
+    def load(cls, db, window_hours: float = DEDUP_WINDOW_HOURS, **thresholds) -> "DraftIndex":
+        index = cls(**thresholds)
+        rows = db.execute(
+            select(Post.id, Post.topic, Post.platform, Post.status).where(
+                Post.status.in_(DEDUP_STATUSES),
+                Post.created_at >= datetime.utcnow() - timedelta(hours=window_hours),
+            )
+        ).all()
+        signatures = signature_store.get_many(db, [row.id for row in rows])
+        for row in rows:
+            index.add(row.topic, row.platform, status=row.status, post_id=row.id, signature=signatures.get(row.id))
+        return index
+
+    def add(self, topic: str, platform: str, content: Optional[str] = None, status: str = "draft",
+            post_id: Optional[int] = None, signature: Optional[List[int]] = None) -> int:
+        """Index a post (or a planned one, without post_id/content); returns the id it is indexed under.
+
+        `signature` is the body's precomputed MinHash, used instead of `content`.
+        """
+        if post_id is None:
+            post_id, self._next_pending = self._next_pending, self._next_pending - 1
+        self._status[post_id] = status
+
+        tokens = topic_tokens(topic)
+        if tokens:
+            self._topics.setdefault(platform, {})[post_id] = tokens
+            inverted = self._tokens.setdefault(platform, {})
+            for token in tokens:
+                inverted.setdefault(token, set()).add(post_id)
+
+        if signature is None:
+            shingles = content_shingles(content)
+            signature = minhash(shingles) if shingles else None
+        if signature:
+            self._signatures[post_id] = signature
+            for band in self._band_keys(platform, signature):
+                self._bands.setdefault(band, set()).add(post_id)
+        return post_id
+
+    def _band_keys(self, platform: str, signature: List[int]):
+        for start in range(0, NUM_PERM, BAND_ROWS):
+            yield (platform, start, tuple(signature[start:start + BAND_ROWS]))
+
+    def similar_topic(self, topic: str, platform: str, statuses: Optional[List[str]] = None) -> Optional[int]:
+        """Id of an indexed post on `platform` about the same topic (optionally only in `statuses`), else None"""
+        tokens = topic_tokens(topic)
+        if not tokens:
+            return None
+        topics = self._topics.get(platform, {})
+        inverted = self._tokens.get(platform, {})
+        candidates = set().union(*(inverted.get(token, set()) for token in tokens))
+        for post_id in candidates:
+            if statuses and self._status[post_id] not in statuses:
+                continue
+            if jaccard(tokens, topics[post_id]) >= self.topic_threshold:
+                return post_id
+        return None
+
+    def similar_content(self, content: str, platform: str) -> Optional[int]:
+        """Id of an indexed post on `platform` whose body is a near-duplicate of `content`, else None"""
+        shingles = content_shingles(content)
+        if not shingles:
+            return None
+        signature = minhash(shingles)
+        candidates = set().union(*(self._bands.get(band, set()) for band in self._band_keys(platform, signature)))
+        for post_id in candidates:
+            other = self._signatures[post_id]
+            estimate = sum(1 for a, b in zip(signature, other) if a == b) / NUM_PERM
+            if estimate >= self.content_threshold:
+                return post_id
+        return None
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from services.redis_client import get_redis, key
+
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", str(6 * 3600)))
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "5000"))
+
+# Read an entry and mark it as recently used (or drop its LRU slot if it expired)
+_GET = """
+local value = redis.call('get', KEYS[1])
+if value then
+    redis.call('zadd', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('hincrby', KEYS[3], 'hits', 1)
+else
+    redis.call('zrem', KEYS[2], ARGV[2])
+    redis.call('hincrby', KEYS[3], 'misses', 1)
+end
+return value
+"""
+
+# Store an entry and evict the least recently used ones beyond the size bound.
+# Slots of entries that expired on their own are dropped first and don't count as evictions:
+# a slot last used more than a TTL ago is always expired, and the oldest slots are checked
+# one by one while enforcing the bound.
+_SET = """
+local now = tonumber(ARGV[3])
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('zremrangebyscore', KEYS[2], '-inf', '(' .. (now - tonumber(ARGV[2])))
+redis.call('zadd', KEYS[2], now, ARGV[4])
+local evictions = 0
+local excess = redis.call('zcard', KEYS[2]) - tonumber(ARGV[5])
+while excess > 0 do
+    local oldest = redis.call('zpopmin', KEYS[2])
+    if redis.call('del', ARGV[6] .. oldest[1]) == 1 then
+        evictions = evictions + 1
+    end
+    excess = excess - 1
+end
+if evictions > 0 then
+    redis.call('hincrby', KEYS[3], 'evictions', evictions)
+end
+return evictions
+"""
+
+class GenerationCache:
+    """LLM completions cached in Redis, keyed by a hash of model, sampling settings and prompt.
+
+    Entries expire after GENERATION_CACHE_TTL seconds and the cache holds at most
+    GENERATION_CACHE_MAX_ENTRIES of them, evicting the least recently used (a
+    sorted set of last-access times). Hit / miss / eviction counters live in
+    Redis too, so they cover every API and worker process.
+    """
+
+    def __init__(self, ttl: int = GENERATION_CACHE_TTL, max_entries: int = GENERATION_CACHE_MAX_ENTRIES,
+                 enabled: bool = GENERATION_CACHE_ENABLED):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lru_key = key("gencache", "lru")
+        self._stats_key = key("gencache", "stats")
+        self._entry_prefix = key("gencache", "entry", "")
+
+    def prompt_hash(self, model: str, system: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        payload = json.dumps([model, temperature, max_tokens, system, prompt])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, prompt_hash: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        try:
+            value = get_redis().eval(
+                _GET, 3, self._entry_prefix + prompt_hash, self._lru_key, self._stats_key, time.time(), prompt_hash
+            )
+        except RedisError as e:
+            print(f"Generation cache unavailable: {e}")
+            return None
+        return value.decode() if value is not None else None
+
+    def set(self, prompt_hash: str, content: str):
+        if not self.enabled:
+            return
+        try:
+            get_redis().eval(
+                _SET, 3, self._entry_prefix + prompt_hash, self._lru_key, self._stats_key,
+                content, self.ttl, time.time(), prompt_hash, self.max_entries, self._entry_prefix,
+            )
+        except RedisError as e:
+            print(f"Generation cache write failed: {e}")
+
+    def stats(self) -> Dict:
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.hgetall(self._stats_key)
+            pipe.zcard(self._lru_key)
+            counters, entries = pipe.execute()
+        except RedisError as e:
+            return {"enabled": self.enabled, "error": str(e)}
+
+        stats = {name: int(counters.get(name.encode(), 0)) for name in ("hits", "misses", "evictions")}
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hit_ratio": round(stats["hits"] / lookups, 3) if lookups else 0,
+        })
+        return stats
+
+# Create global instance
+generation_cache = GenerationCache()
@@ -0,0 +1,238 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Timeouts for platform API calls, in seconds: establishing the connection / waiting for each read
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+# Hosts kept in the pool, and keep-alive connections per host (per process)
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+# Retries for connection errors and 429 / 5xx, with exponential backoff from HTTP_RETRY_BACKOFF seconds
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# A POST that got an error response may still have published; only idempotent requests are retried on one
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+# Longest Retry-After honoured before giving up on a retry
+MAX_RETRY_AFTER = 30.0
+
+class HostStats:
+    """Request counts and latencies per host for this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict] = {}
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+    def record(self, host: str, latency: float, retries: int = 0, failed: bool = False):
+        with self._lock:
+            stats = self._hosts.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "latency": 0.0, "max": 0.0})
+            stats["requests"] += 1
+            stats["errors"] += int(failed)
+            stats["retries"] += retries
+            stats["latency"] += latency
+            stats["max"] = max(stats["max"], latency)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                host: {
+                    "requests": stats["requests"],
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "latency_ms_avg": round(stats["latency"] * 1000 / stats["requests"], 1),
+                    "latency_ms_max": round(stats["max"] * 1000, 1),
+                }
+                for host, stats in self._hosts.items()
+            }
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+def _retry_after(response) -> Optional[float]:
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class PooledSession(requests.Session):
+    """requests.Session with default timeouts that records per-host stats (also used as tweepy's session)"""
+
+    def __init__(self, host_stats: HostStats):
+        super().__init__()
+        self.host_stats = host_stats
+        retry = Retry(
+            total=HTTP_MAX_RETRIES,
+            backoff_factor=HTTP_RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            respect_retry_after_header=True,
+            # Callers look at the status code themselves
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            self.host_stats.record(_host(url), time.monotonic() - started, failed=True)
+            raise
+        retries = response.raw.retries.history if getattr(response.raw, "retries", None) else ()
+        self.host_stats.record(_host(url), time.monotonic() - started, len(retries), failed=response.status_code >= 500)
+        return response
+
+class HTTPClient:
+    """Shared HTTP client for the platform APIs.
+
+    Sync callers (Celery tasks, sync endpoints) share one requests.Session per
+    process, with a keep-alive connection pool per host; async endpoints share
+    one httpx.AsyncClient per process and event loop. Both apply the connect /
+    read timeouts unless a call passes its own, and retry connection errors
+    and 429 / 5xx responses (idempotent methods only) with exponential backoff,
+    honouring Retry-After.
+    """
+
+    def __init__(self):
+        self._session = None
+        self._session_pid = None
+        self._async_client = None
+        self._async_key = None
+        self._lock = threading.Lock()
+        self.host_stats = HostStats()
+
+    def session(self) -> PooledSession:
+        """This process's session (sockets aren't shared with forked children)"""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    self.host_stats.reset()
+                    self._session = PooledSession(self.host_stats)
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session().request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def async_client(self) -> httpx.AsyncClient:
+        """This process's and event loop's async client (httpx connections are bound to their loop)"""
+        key = (os.getpid(), id(asyncio.get_running_loop()))
+        if self._async_client is None or self._async_key != key:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_HOSTS * HTTP_POOL_MAXSIZE,
+                    max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                ),
+                # Retries connection failures only; responses are retried in arequest()
+                transport=httpx.AsyncHTTPTransport(retries=HTTP_MAX_RETRIES),
+            )
+            self._async_key = key
+        return self._async_client
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        client = self.async_client()
+        retryable = method.upper() in RETRY_METHODS
+        started = time.monotonic()
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                if not retryable or attempt == HTTP_MAX_RETRIES:
+                    self.host_stats.record(_host(url), time.monotonic() - started, attempt, failed=True)
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            delay = _retry_after(response) or self._backoff(attempt)
+            if (response.status_code not in RETRY_STATUSES or not retryable
+                    or attempt == HTTP_MAX_RETRIES or delay > MAX_RETRY_AFTER):
+                self.host_stats.record(_host(url), time.monotonic() - started, attempt,
+                                       failed=response.status_code >= 500)
+                return response
+            await response.aclose()
+            await asyncio.sleep(delay)
+
+    async def aget(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    def _backoff(self, attempt: int) -> float:
+        return HTTP_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def _sync_pools(self) -> Dict:
+        pools = {}
+        if self._session is None or self._session_pid != os.getpid():
+            return pools
+        adapter = self._session.get_adapter("https://")
+        manager = adapter.poolmanager
+        for pool_key in list(manager.pools.keys()):
+            pool = manager.pools.get(pool_key)
+            if pool is None:
+                continue
+            pools[f"{pool_key.key_scheme}://{pool_key.key_host}:{pool_key.key_port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                # The pool's queue is padded with None for connections it may still open
+                "idle": sum(1 for connection in list(pool.pool.queue) if connection is not None) if pool.pool else 0,
+                "maxsize": pool.pool.maxsize if pool.pool is not None else HTTP_POOL_MAXSIZE,
+            }
+        return pools
+
+    def _async_pool(self) -> Optional[Dict]:
+        if self._async_client is None or self._async_key[0] != os.getpid():
+            return None
+        # httpcore's pool behind the transport; not public API, so only reported when present
+        pool = getattr(getattr(self._async_client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "connections": len(connections),
+            "idle": sum(1 for connection in connections if connection.is_idle()),
+            "max_connections": HTTP_POOL_HOSTS * HTTP_POOL_MAXSIZE,
+        }
+
+    def stats(self) -> Dict:
+        """Connection pools and per-host request stats for this process"""
+        return {
+            "pid": os.getpid(),
+            "timeouts": {"connect": HTTP_CONNECT_TIMEOUT, "read": HTTP_READ_TIMEOUT},
+            "sync_pools": self._sync_pools(),
+            "async_pool": self._async_pool(),
+            "hosts": self.host_stats.snapshot(),
+        }
+
+# Create global instance
+http_client = HTTPClient()
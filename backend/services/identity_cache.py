@@ -0,0 +1,80 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from services.redis_client import get_redis, key
+
+# How long a resolved account id (author URN, business account, channel) is trusted, in seconds
+IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", str(24 * 3600)))
+
+def token_fingerprint(token: str) -> str:
+    """Stable, non-reversible id for an access token (tokens themselves never go to Redis)"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+class IdentityCache:
+    """Account ids the platform APIs resolve from an access token, cached per token.
+
+    Entries are keyed by platform and a fingerprint of the token, so a rotated
+    token simply misses and resolves again. Resolved ids are kept in this
+    process and in Redis (shared by every API and worker process) for
+    IDENTITY_CACHE_TTL seconds; invalidate() drops both, e.g. when the
+    platform answers 401 (other processes drop their copy on their own 401).
+    Without Redis ids are only cached in the process.
+    """
+
+    def __init__(self, ttl: int = IDENTITY_CACHE_TTL):
+        self.ttl = ttl
+        self._local: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, platform: str, fingerprint: str) -> str:
+        return key("identity", platform, fingerprint)
+
+    def get_or_resolve(self, platform: str, token: str, resolve: Callable[[], Optional[str]]) -> Optional[str]:
+        """The cached id for (platform, token), else resolve() it; None results are not cached"""
+        fingerprint = token_fingerprint(token)
+        local_key = (platform, fingerprint)
+        identity, expires_at = self._local.get(local_key, (None, 0.0))
+        if identity is not None and expires_at > time.monotonic():
+            return identity
+        identity = None
+
+        redis = None
+        try:
+            redis = get_redis()
+            cached = redis.get(self._key(platform, fingerprint))
+            if cached is not None:
+                identity = cached.decode()
+        except RedisError as e:
+            print(f"Identity cache unavailable: {e}")
+            redis = None
+
+        if identity is None:
+            identity = resolve()
+            if identity is None:
+                return None
+            if redis is not None:
+                try:
+                    redis.set(self._key(platform, fingerprint), identity, ex=self.ttl)
+                except RedisError as e:
+                    print(f"Identity cache write failed: {e}")
+
+        with self._lock:
+            self._local[local_key] = (identity, time.monotonic() + self.ttl)
+        return identity
+
+    def invalidate(self, platform: str, token: str):
+        fingerprint = token_fingerprint(token)
+        with self._lock:
+            self._local.pop((platform, fingerprint), None)
+        try:
+            get_redis().delete(self._key(platform, fingerprint))
+        except RedisError as e:
+            print(f"Identity cache invalidation failed: {e}")
+
+# Create global instance
+identity_cache = IdentityCache()
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+import openai
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# Where OpenAIService sends chat completions:
+#   openai     - the OpenAI API
+#   record     - the OpenAI API, appending every prompt/response pair and its latency to LLM_RECORDING_FILE
+#   replay     - responses from LLM_RECORDING_FILE (synthetic text for prompts that were never recorded)
+#   synthetic  - generated placeholder text, no network access at all
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+LLM_RECORDING_FILE = os.getenv("LLM_RECORDING_FILE", "./llm_recordings.jsonl")
+# Latency of replayed / synthetic responses: "recorded" (replay only), "fixed:S", "uniform:MIN,MAX",
+# "normal:MEAN,STDDEV" or "lognormal:MEDIAN,SIGMA", in seconds
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "recorded")
+LLM_SYNTHETIC_LATENCY = os.getenv("LLM_SYNTHETIC_LATENCY", "lognormal:0.8,0.4")
+# Per-model overrides of the synthetic latency, e.g. "gpt-4=lognormal:3,0.4;gpt-3.5-turbo=lognormal:0.8,0.3"
+LLM_SYNTHETIC_MODEL_LATENCY = os.getenv("LLM_SYNTHETIC_MODEL_LATENCY", "")
+
+SYNTHETIC_WORDS = (
+    "growth launch team data future insight build ship learn trend market customer product "
+    "story idea scale design community impact strategy tools workflow results lesson"
+).split()
+
+def parse_latency(spec: str):
+    """Sampler for a latency spec; returns None for "recorded" """
+    name, _, args = spec.partition(":")
+    try:
+        values = [float(value) for value in args.split(",")] if args else []
+        if name == "recorded":
+            return None
+        if name == "fixed":
+            (seconds,) = values
+            return lambda: seconds
+        if name == "uniform":
+            low, high = values
+            return lambda: random.uniform(low, high)
+        if name == "normal":
+            mean, stddev = values
+            return lambda: max(0.0, random.gauss(mean, stddev))
+        if name == "lognormal":
+            median, sigma = values
+            return lambda: random.lognormvariate(0, sigma) * median
+    except ValueError as e:
+        raise ValueError(f"Invalid latency {spec!r}: {e}") from e
+    raise ValueError(f"Unknown latency distribution {spec!r}")
+
+def prompt_key(messages: List[Dict], max_tokens: int, temperature: float) -> str:
+    """Recording lookup key; leaves out the model so recordings survive a model switch"""
+    payload = json.dumps([messages, max_tokens, temperature])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _completion(content: str, model: str, prompt_tokens: int) -> ChatCompletion:
+    completion_tokens = len(content) // 4 + 1
+    return ChatCompletion(
+        id=f"chatcmpl-{uuid.uuid4().hex}",
+        object="chat.completion",
+        created=int(time.time()),
+        model=model,
+        choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        usage=CompletionUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+def _stream(content: str, model: str, first_token: float, total: float) -> Iterator[ChatCompletionChunk]:
+    """`content` as a chunk stream: the first chunk after `first_token` seconds, the rest spread up to `total`"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    pieces = re.findall(r"\S+\s*|\s+", content) or [""]
+    time.sleep(first_token)
+    step = max(0.0, total - first_token) / max(1, len(pieces) - 1)
+    for index, piece in enumerate(pieces):
+        if index:
+            time.sleep(step)
+        yield ChatCompletionChunk(
+            id=completion_id,
+            object="chat.completion.chunk",
+            created=int(time.time()),
+            model=model,
+            choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        )
+
+class OpenAIBackend:
+    name = "openai"
+
+    def create(self, **params):
+        return openai.chat.completions.create(**params)
+
+class RecordingBackend:
+    """The OpenAI API, with every successful prompt/response pair appended to a JSONL file.
+
+    Each line holds the request, the response text, the total latency and (for
+    streams) the time to the first token, which is what ReplayBackend serves.
+    """
+
+    name = "record"
+
+    def __init__(self, path: str = LLM_RECORDING_FILE, inner: Optional[OpenAIBackend] = None):
+        self.path = path
+        self.inner = inner or OpenAIBackend()
+        self._lock = threading.Lock()
+
+    def _record(self, params: Dict, content: str, latency: float, first_token: Optional[float]):
+        entry = {
+            "key": prompt_key(params["messages"], params.get("max_tokens"), params.get("temperature")),
+            "model": params.get("model"),
+            "messages": params["messages"],
+            "max_tokens": params.get("max_tokens"),
+            "temperature": params.get("temperature"),
+            "response": content,
+            "latency": round(latency, 4),
+            "first_token_latency": round(first_token, 4) if first_token is not None else None,
+            "recorded_at": time.time(),
+        }
+        # One write per line so lines from concurrent threads and processes don't interleave
+        line = json.dumps(entry) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+    def create(self, **params):
+        started = time.monotonic()
+        response = self.inner.create(**params)
+        if not params.get("stream"):
+            self._record(params, response.choices[0].message.content or "", time.monotonic() - started, None)
+            return response
+        return self._record_stream(params, response, started)
+
+    def _record_stream(self, params: Dict, stream, started: float):
+        parts = []
+        first_token = None
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                parts.append(delta)
+            yield chunk
+        self._record(params, "".join(parts), time.monotonic() - started, first_token)
+
+class SyntheticBackend:
+    """Placeholder completions with a configurable latency, for load tests without network access.
+
+    Bundled (JSON) prompts get a JSON reply with one variant per requested
+    platform and tone, so the same code paths run as against the real API.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, latency: str = LLM_SYNTHETIC_LATENCY, model_latency: str = LLM_SYNTHETIC_MODEL_LATENCY):
+        self.latency = parse_latency(latency)
+        if self.latency is None:
+            raise ValueError("The synthetic backend needs a latency distribution, not 'recorded'")
+        self.model_latency = {}
+        for entry in filter(None, (part.strip() for part in model_latency.split(";"))):
+            model, _, spec = entry.partition("=")
+            sampler = parse_latency(spec.strip())
+            if sampler is None:
+                raise ValueError(f"Invalid model latency {entry!r}: 'recorded' isn't a distribution")
+            self.model_latency[model.strip()] = sampler
+
+    def text(self, messages: List[Dict], max_tokens: int) -> str:
+        prompt = messages[-1]["content"]
+        topic = re.search(r"'([^']*)'", prompt)
+        topic = topic.group(1) if topic else "this"
+        if "JSON" in messages[0]["content"]:
+            platforms = re.findall(r"^- (\w+):", prompt, re.MULTILINE)
+            count = re.search(r"write (\d+) distinct", prompt)
+            count = int(count.group(1)) if count else 1
+            return json.dumps({
+                platform: [f"Synthetic {platform} post {i + 1} about {topic} #{uuid.uuid4().hex[:6]}" for i in range(count)]
+                for platform in platforms
+            })
+        # Random filler, so synthetic posts aren't near-duplicates of each other
+        words = ["Synthetic", "post", "about", topic] + random.choices(SYNTHETIC_WORDS, k=40)
+        text = " ".join(words)[:min(max_tokens * 4, 240)]
+        return f"{text} #{uuid.uuid4().hex[:6]}"
+
+    def respond(self, messages: List[Dict], max_tokens: int, model: str, stream: bool, content: str,
+                latency: float, first_token: Optional[float] = None, timeout: Optional[float] = None):
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        if first_token is None:
+            first_token = latency * 0.2
+        # Like the API client: give up after `timeout` seconds without a response (or first chunk)
+        if timeout is not None and (first_token if stream else latency) > timeout:
+            time.sleep(timeout)
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        if stream:
+            return _stream(content, model, first_token, latency)
+        time.sleep(latency)
+        return _completion(content, model, prompt_tokens)
+
+    def create(self, model: str, messages: List[Dict], max_tokens: int = 200, temperature: float = 0.7,
+               stream: bool = False, timeout: Optional[float] = None, **_):
+        latency = self.model_latency.get(model, self.latency)()
+        return self.respond(messages, max_tokens, model, stream, self.text(messages, max_tokens), latency,
+                            timeout=timeout)
+
+class ReplayBackend(SyntheticBackend):
+    """Serves recorded responses (see RecordingBackend) without calling the API.
+
+    Prompts recorded more than once cycle through their responses. Latency is
+    the recorded one by default or drawn from LLM_REPLAY_LATENCY; prompts that
+    were never recorded get synthetic text.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: str = LLM_RECORDING_FILE, latency: str = LLM_REPLAY_LATENCY,
+                 fallback_latency: str = LLM_SYNTHETIC_LATENCY):
+        super().__init__(fallback_latency)
+        self.replay_latency = parse_latency(latency)
+        self.recordings: Dict[str, List[Dict]] = {}
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recordings.setdefault(entry["key"], []).append(entry)
+        else:
+            print(f"No LLM recordings at {path}; replaying synthetic responses only")
+
+    def create(self, model: str, messages: List[Dict], max_tokens: int = 200, temperature: float = 0.7,
+               stream: bool = False, timeout: Optional[float] = None, **_):
+        key = prompt_key(messages, max_tokens, temperature)
+        entries = self.recordings.get(key)
+        if not entries:
+            with self._lock:
+                self.misses += 1
+            return super().create(model, messages, max_tokens, temperature, stream, timeout)
+
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        entry = entries[position % len(entries)]
+        if self.replay_latency is None:
+            latency, first_token = entry["latency"], entry.get("first_token_latency")
+        else:
+            latency, first_token = self.replay_latency(), None
+        return self.respond(messages, max_tokens, model, stream, entry["response"], latency, first_token, timeout)
+
+def get_llm_backend(name: str = LLM_BACKEND):
+    backends = {
+        "openai": OpenAIBackend,
+        "record": RecordingBackend,
+        "replay": ReplayBackend,
+        "synthetic": SyntheticBackend,
+    }
+    if name not in backends:
+        raise ValueError(f"Unknown LLM_BACKEND {name!r} (expected one of: {', '.join(backends)})")
+    return backends[name]()
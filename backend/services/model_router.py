@@ -0,0 +1,145 @@
+import contextvars
+import os
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from services.rate_limiter import INTERACTIVE, current_priority
+from services.redis_client import get_redis, key
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+OPENAI_FAST_MODEL = os.getenv("OPENAI_FAST_MODEL", "gpt-3.5-turbo")
+
+TWEET = "tweet"
+LINKEDIN = "linkedin"
+CAPTION = "caption"
+REWRITE = "rewrite"
+BUNDLE = "bundle"
+
+PLATFORM_TASKS = {"twitter": TWEET, "linkedin": LINKEDIN, "instagram": CAPTION}
+
+# Models tried in order for each task type; override with e.g. MODEL_CASCADE_TWEET=gpt-3.5-turbo,gpt-4.
+# Short formats start on the fast model and only escalate when it misses the quality bar or times out.
+DEFAULT_CASCADES = {
+    TWEET: [OPENAI_FAST_MODEL, OPENAI_MODEL],
+    CAPTION: [OPENAI_FAST_MODEL, OPENAI_MODEL],
+    LINKEDIN: [OPENAI_MODEL, OPENAI_FAST_MODEL],
+    REWRITE: [OPENAI_MODEL, OPENAI_FAST_MODEL],
+    BUNDLE: [OPENAI_MODEL, OPENAI_FAST_MODEL],
+}
+
+# Seconds a whole cascade may take, by rate-limit lane, unless the caller sets a budget
+MODEL_LATENCY_BUDGET = float(os.getenv("MODEL_LATENCY_BUDGET", "60"))
+MODEL_LATENCY_BUDGET_INTERACTIVE = float(os.getenv("MODEL_LATENCY_BUDGET_INTERACTIVE", "20"))
+# Share of the remaining budget a model gets when there is another model to fall back to
+MODEL_PRIMARY_BUDGET_SHARE = float(os.getenv("MODEL_PRIMARY_BUDGET_SHARE", "0.6"))
+
+_budget = contextvars.ContextVar("llm_latency_budget", default=None)
+
+@contextmanager
+def llm_latency_budget(seconds: Optional[float]):
+    """Latency budget for the LLM calls made in this context (None = the lane's default)"""
+    token = _budget.set(seconds)
+    try:
+        yield
+    finally:
+        _budget.reset(token)
+
+def _meets_tweet_bar(content: str) -> bool:
+    return len(content) <= 280
+
+def _meets_caption_bar(content: str) -> bool:
+    return "#" in content
+
+# What a reply must satisfy for the cascade to stop at the model that produced it
+QUALITY_BARS = {TWEET: _meets_tweet_bar, CAPTION: _meets_caption_bar}
+
+class ModelRouter:
+    """Which models serve each task type, in what order, within what latency budget.
+
+    Per-model latency, token use, timeouts and escalations are counted in Redis
+    (per task type, across all processes) for tuning the cascades.
+    """
+
+    def __init__(self, cascades: Optional[Dict[str, List[str]]] = None):
+        self.cascades = cascades or {
+            task: self._configured(task, default) for task, default in DEFAULT_CASCADES.items()
+        }
+
+    def _configured(self, task: str, default: List[str]) -> List[str]:
+        value = os.getenv(f"MODEL_CASCADE_{task.upper()}")
+        models = [model.strip() for model in value.split(",") if model.strip()] if value else default
+        # A model listed twice would only repeat the same timeout
+        return list(dict.fromkeys(models))
+
+    def cascade(self, task: str) -> List[str]:
+        return self.cascades.get(task) or [OPENAI_MODEL]
+
+    def task_for_platform(self, platform: str) -> str:
+        return PLATFORM_TASKS.get(platform, TWEET)
+
+    def budget(self) -> float:
+        budget = _budget.get()
+        if budget is not None:
+            return budget
+        return MODEL_LATENCY_BUDGET_INTERACTIVE if current_priority() == INTERACTIVE else MODEL_LATENCY_BUDGET
+
+    def meets_bar(self, task: str, content: str) -> bool:
+        check = QUALITY_BARS.get(task)
+        return bool(content) and (check is None or check(content))
+
+    def _stats_key(self, model: str, task: str) -> str:
+        return key("llm", "models", model, task)
+
+    def record(self, model: str, task: str, latency: float, tokens: Optional[int] = None,
+               timed_out: bool = False, failed: bool = False, escalated: bool = False):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            stats_key = self._stats_key(model, task)
+            pipe.hincrby(stats_key, "calls", 1)
+            pipe.hincrbyfloat(stats_key, "latency_total", latency)
+            if tokens:
+                pipe.hincrby(stats_key, "tokens", tokens)
+            if timed_out:
+                pipe.hincrby(stats_key, "timeouts", 1)
+            if failed:
+                pipe.hincrby(stats_key, "errors", 1)
+            if escalated:
+                pipe.hincrby(stats_key, "escalations", 1)
+            pipe.execute()
+        except RedisError as e:
+            print(f"Model stats update failed: {e}")
+
+    def stats(self) -> Dict:
+        pairs = [(task, model) for task, models in self.cascades.items() for model in models]
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for task, model in pairs:
+                pipe.hgetall(self._stats_key(model, task))
+            results = pipe.execute()
+        except RedisError as e:
+            return {"cascades": self.cascades, "error": str(e)}
+
+        models = {}
+        for (task, model), counters in zip(pairs, results):
+            counters = {name.decode(): float(value) for name, value in counters.items()}
+            calls = int(counters.get("calls", 0))
+            if not calls:
+                continue
+            models.setdefault(model, {})[task] = {
+                "calls": calls,
+                "avg_latency_ms": round(counters.get("latency_total", 0) * 1000 / calls, 1) if calls else None,
+                "tokens": int(counters.get("tokens", 0)),
+                "timeouts": int(counters.get("timeouts", 0)),
+                "errors": int(counters.get("errors", 0)),
+                "escalations": int(counters.get("escalations", 0)),
+            }
+        return {
+            "cascades": self.cascades,
+            "latency_budget": {"background": MODEL_LATENCY_BUDGET, "interactive": MODEL_LATENCY_BUDGET_INTERACTIVE},
+            "models": models,
+        }
+
+# Create global instance
+model_router = ModelRouter()
@@ -1,47 +1,477 @@
+import contextvars
+import json
 import openai
 import os
-from typing import Dict, List
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+from services.generation_cache import generation_cache
+from services.llm_backends import get_llm_backend
+from services.model_router import BUNDLE, MODEL_PRIMARY_BUDGET_SHARE, REWRITE, model_router
+from services.rate_limiter import RateLimitTimeout, openai_rate_limiter
+
+# Upper bound on OpenAI calls in flight at once from one process
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+# Streamed generations run on their own threads so they never hold up batch generation
+OPENAI_STREAM_CONCURRENCY = int(os.getenv("OPENAI_STREAM_CONCURRENCY", "12"))
+# Retries for 429s, timeouts and 5xx, with exponential backoff and full jitter
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "1.0"))
+OPENAI_RETRY_MAX_DELAY = 30.0
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+# Ask for all platforms' variants of a topic in one JSON completion instead of one call each
+OPENAI_BUNDLE_GENERATION = os.getenv("OPENAI_BUNDLE_GENERATION", "true").lower() in ("1", "true", "yes", "on")
+
+# Tones used for A/B variants, in order
+VARIANT_TONES = ["engaging", "professional", "witty", "informative"]
+
+# What each platform's post should look like, for bundled prompts
+PLATFORM_GUIDELINES = {
+    "twitter": "a witty, engaging tweet under 280 characters with relevant hashtags",
+    "linkedin": "a professional, insightful LinkedIn post with a call-to-action",
+    "instagram": "a visually engaging Instagram caption with emojis and 3-5 hashtags",
+}
+PLATFORM_MAX_LENGTH = {"twitter": 280}
+
+# Yielded by the streaming calls when a fallback model replaces the text yielded so far
+STREAM_RESTART = object()
+
+class GenerationError(Exception):
+    """An LLM call failed for good (after retries); nothing should be saved from it"""
+
+class ModelTimeout(GenerationError):
+    """A model didn't answer within its share of the latency budget"""
+
+def estimate_tokens(system: str, prompt: str, max_tokens: int) -> int:
+    """Upper-bound token cost of a request: ~4 characters per prompt token plus the full completion budget"""
+    return (len(system) + len(prompt)) // 4 + 8 + max_tokens
 
 class OpenAIService:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = OPENAI_MAX_CONCURRENCY, stream_concurrency: int = OPENAI_STREAM_CONCURRENCY):
         openai.api_key = os.getenv("OPENAI_API_KEY")
-        
-    def generate_post_content(self, topic: str, platform: str, tone: str = "engaging") -> str:
-        """Generate platform-specific content for a topic"""
-        
+        # Retries happen in _chat_completion, behind the shared rate limiter
+        openai.max_retries = 0
+        # The OpenAI API, or a recording / replay / synthetic stand-in (LLM_BACKEND)
+        self.backend = get_llm_backend()
+        self.max_concurrency = max_concurrency
+        self.stream_concurrency = stream_concurrency
+        # Thread pool name -> (pid, executor)
+        self._executors: Dict[str, tuple] = {}
+        self._executor_lock = threading.Lock()
+    
+    def _pool(self, name: str = "openai") -> ThreadPoolExecutor:
+        """This process's generation threads (threads don't survive a fork, so each child makes its own)"""
+        pid, executor = self._executors.get(name, (None, None))
+        if pid != os.getpid():
+            with self._executor_lock:
+                pid, executor = self._executors.get(name, (None, None))
+                if pid != os.getpid():
+                    workers = self.stream_concurrency if name == "openai-stream" else self.max_concurrency
+                    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+                    self._executors[name] = (os.getpid(), executor)
+        return executor
+    
+    def submit(self, fn: Callable, *args):
+        """Run fn(*args) on the generation threads, in the caller's context (so with its rate-limit priority)"""
+        return self._pool().submit(contextvars.copy_context().run, fn, *args)
+    
+    def submit_stream(self, fn: Callable, *args):
+        """submit() for a streamed generation, on the stream threads"""
+        return self._pool("openai-stream").submit(contextvars.copy_context().run, fn, *args)
+    
+    def _chat_completion(self, task: str, system: str, prompt: str, max_tokens: int = 200, temperature: float = 0.7,
+                         force_refresh: bool = False, cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        """One chat completion; every OpenAI call goes through here.
+
+        Completions are served from the generation cache when the same prompt was
+        sent with the same models and settings before; force_refresh skips the
+        lookup (the fresh result still replaces the cached one).
+
+        Models are tried in the task's cascade order (services/model_router.py)
+        within the context's latency budget. The next model takes over when one
+        times out on its share of the budget, fails, or replies below the quality
+        bar (the task's, and `cacheable` if given). If no reply meets the bar the
+        last usable one is returned, uncached.
+
+        Each model call first takes its estimated tokens from the cluster-wide rate
+        limiter, once for all of its retries, and hands them back if it fails.
+        Rate limits and server errors are retried with jittered exponential
+        backoff; running out of models raises GenerationError.
+        """
+        cascade = model_router.cascade(task)
+        prompt_hash = generation_cache.prompt_hash(",".join(cascade), system, prompt, max_tokens, temperature)
+        if not force_refresh:
+            cached = generation_cache.get(prompt_hash)
+            if cached is not None:
+                return cached
+
+        estimated = estimate_tokens(system, prompt, max_tokens)
+        deadline = time.monotonic() + model_router.budget()
+        best_effort = None
+        error = None
+
+        for position, model in enumerate(cascade):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            has_fallback = position < len(cascade) - 1
+            started = time.monotonic()
+            try:
+                response = self._create(
+                    model, estimated, system, prompt, max_tokens, temperature,
+                    timeout=remaining * MODEL_PRIMARY_BUDGET_SHARE if has_fallback else remaining
+                )
+            except GenerationError as e:
+                timed_out = isinstance(e, ModelTimeout)
+                model_router.record(model, task, time.monotonic() - started, timed_out=timed_out, failed=not timed_out)
+                if isinstance(e.__cause__, RateLimitTimeout):
+                    # Another model would wait for the same quota
+                    raise
+                error = e
+                continue
+
+            usage = getattr(response, "usage", None)
+            tokens = getattr(usage, "total_tokens", None)
+            openai_rate_limiter.settle(estimated, tokens)
+
+            content = (response.choices[0].message.content or "").strip()
+            good = model_router.meets_bar(task, content) and (cacheable is None or cacheable(content))
+            model_router.record(model, task, time.monotonic() - started, tokens, escalated=not good and has_fallback)
+            if good:
+                generation_cache.set(prompt_hash, content)
+                return content
+            best_effort = content or best_effort
+
+        if best_effort:
+            return best_effort
+        if error is not None:
+            raise error
+        raise GenerationError("No latency budget left" if time.monotonic() >= deadline
+                              else "OpenAI returned an empty completion")
+    
+    def _create(self, model: str, estimated: int, system: str, prompt: str, max_tokens: int, temperature: float,
+                stream: bool = False, timeout: Optional[float] = None):
+        """Send a chat completion request to `model` through the rate limiter, retrying transient failures.
+
+        Raises ModelTimeout if the model doesn't answer within `timeout` seconds
+        (timeouts aren't retried: the cascade moves on to the next model), and
+        GenerationError caused by RateLimitTimeout if the rate limiter has no
+        capacity within that time.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        # One reservation covers the retries: a rejected attempt uses no tokens. Waiting for
+        # it counts against the model's share of the latency budget.
+        try:
+            openai_rate_limiter.acquire(estimated, timeout=timeout)
+        except RateLimitTimeout as e:
+            raise GenerationError(str(e)) from e
+
+        try:
+            return self._send(model, system, prompt, max_tokens, temperature, stream, deadline)
+        except GenerationError:
+            # Hand the reservation back so the failure doesn't throttle the other workers
+            openai_rate_limiter.settle(estimated, 0)
+            raise
+    
+    def _send(self, model: str, system: str, prompt: str, max_tokens: int, temperature: float, stream: bool,
+              deadline: Optional[float]):
+        for attempt in range(OPENAI_MAX_RETRIES + 1):
+            try:
+                params = {}
+                if deadline is not None:
+                    params["timeout"] = max(0.1, deadline - time.monotonic())
+                return self.backend.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=stream,
+                    **params
+                )
+            except openai.APITimeoutError as e:
+                raise ModelTimeout(f"{model} timed out") from e
+            except RETRYABLE_ERRORS as e:
+                delay = self._retry_delay(attempt, e)
+                if attempt == OPENAI_MAX_RETRIES:
+                    raise GenerationError(f"{model} failed after {attempt + 1} attempts: {e}") from e
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise ModelTimeout(f"{model} did not recover within its latency budget: {e}") from e
+                time.sleep(delay)
+            except openai.OpenAIError as e:
+                raise GenerationError(f"{model} failed: {e}") from e
+    
+    def _stream_completion(self, task: str, system: str, prompt: str, max_tokens: int = 200, temperature: float = 0.7,
+                           force_refresh: bool = False) -> Iterator[str]:
+        """_chat_completion() that yields the completion's text as it arrives.
+
+        A cached completion is yielded in one piece. Models are tried in the
+        cascade order within the latency budget, like _chat_completion(): the
+        next model takes over when one fails or times out (also mid-stream) or
+        its complete text is below the task's quality bar. Before a model
+        replaces text that was already yielded, STREAM_RESTART is yielded and
+        the consumer drops what it has. If no reply meets the bar the last
+        usable one is what the consumer ends up with, uncached; running out of
+        models raises GenerationError. The complete text is cached once a
+        reply meets the bar.
+        """
+        cascade = model_router.cascade(task)
+        prompt_hash = generation_cache.prompt_hash(",".join(cascade), system, prompt, max_tokens, temperature)
+        if not force_refresh:
+            cached = generation_cache.get(prompt_hash)
+            if cached is not None:
+                yield cached
+                return
+
+        estimated = estimate_tokens(system, prompt, max_tokens)
+        deadline = time.monotonic() + model_router.budget()
+        best_effort = None
+        error = None
+        # Text the consumer holds since the last restart
+        shown = []
+
+        for position, model in enumerate(cascade):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            has_fallback = position < len(cascade) - 1
+            started = time.monotonic()
+            try:
+                stream = self._create(
+                    model, estimated, system, prompt, max_tokens, temperature, stream=True,
+                    timeout=remaining * MODEL_PRIMARY_BUDGET_SHARE if has_fallback else remaining
+                )
+            except GenerationError as e:
+                timed_out = isinstance(e, ModelTimeout)
+                model_router.record(model, task, time.monotonic() - started, timed_out=timed_out, failed=not timed_out)
+                if isinstance(e.__cause__, RateLimitTimeout):
+                    raise
+                error = e
+                continue
+
+            parts = []
+            try:
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    if not parts and shown:
+                        yield STREAM_RESTART
+                        shown = []
+                    parts.append(delta)
+                    shown.append(delta)
+                    yield delta
+            except openai.OpenAIError as e:
+                timed_out = isinstance(e, openai.APITimeoutError)
+                model_router.record(model, task, time.monotonic() - started, timed_out=timed_out, failed=not timed_out)
+                # Streamed responses carry no usage; charge what arrived before the failure
+                openai_rate_limiter.settle(estimated, estimate_tokens(system, prompt, 0) + len("".join(parts)) // 4)
+                error = (ModelTimeout(f"{model} stream timed out") if timed_out
+                         else GenerationError(f"OpenAI stream failed: {e}"))
+                continue
+
+            content = "".join(parts).strip()
+            tokens = estimate_tokens(system, prompt, 0) + len(content) // 4
+            openai_rate_limiter.settle(estimated, tokens)
+            good = model_router.meets_bar(task, content)
+            model_router.record(model, task, time.monotonic() - started, tokens, escalated=not good and has_fallback)
+            if good:
+                generation_cache.set(prompt_hash, content)
+                return
+            best_effort = content or best_effort
+
+        if best_effort:
+            if "".join(shown).strip() != best_effort:
+                if shown:
+                    yield STREAM_RESTART
+                yield best_effort
+            return
+        if error is not None:
+            raise error
+        raise GenerationError("No latency budget left" if time.monotonic() >= deadline
+                              else "OpenAI returned an empty completion")
+    
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than a Retry-After the API asked for"""
+        delay = random.uniform(0, min(OPENAI_RETRY_MAX_DELAY, OPENAI_RETRY_BASE_DELAY * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            return delay
+    
+    def _post_prompt(self, topic: str, platform: str, tone: str) -> str:
         platform_prompts = {
             "twitter": f"Write a witty, engaging tweet about '{topic}'. Keep it under 280 characters. Include relevant hashtags. Tone: {tone}",
             "linkedin": f"Write a professional LinkedIn post about '{topic}'. Make it insightful and engaging. Include a call-to-action. Tone: {tone}",
             "instagram": f"Write an Instagram caption about '{topic}'. Make it visually engaging with emojis and 3-5 hashtags. Tone: {tone}"
         }
         
-        prompt = platform_prompts.get(platform, platform_prompts["twitter"])
-        
+        return platform_prompts.get(platform, platform_prompts["twitter"])
+    
+    def generate_post_content(self, topic: str, platform: str, tone: str = "engaging", force_refresh: bool = False) -> str:
+        """Generate platform-specific content for a topic; raises GenerationError on failure"""
+        return self._chat_completion(
+            model_router.task_for_platform(platform),
+            "You are a social media expert creating engaging content.",
+            self._post_prompt(topic, platform, tone),
+            max_tokens=200,
+            temperature=0.7,
+            force_refresh=force_refresh
+        )
+    
+    def stream_post_content(self, topic: str, platform: str, tone: str = "engaging",
+                            force_refresh: bool = False) -> Iterator[str]:
+        """generate_post_content() as a stream of text deltas (shares its cache entries)"""
+        return self._stream_completion(
+            model_router.task_for_platform(platform),
+            "You are a social media expert creating engaging content.",
+            self._post_prompt(topic, platform, tone),
+            max_tokens=200,
+            temperature=0.7,
+            force_refresh=force_refresh
+        )
+    
+    def _generate_or_error(self, request: Dict):
+        try:
+            return self.generate_post_content(**request)
+        except GenerationError as e:
+            print(f"Generation failed for {request.get('topic')} on {request.get('platform')}: {e}")
+            return e
+    
+    def _optimize_or_error(self, request: Dict):
         try:
-            response = openai.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a social media expert creating engaging content."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.7
+            return self.optimize_content(**request)
+        except GenerationError as e:
+            print(f"Optimization failed: {e}")
+            return e
+    
+    def _run_batch(self, fn: Callable, requests: List[Dict]) -> List:
+        if len(requests) <= 1:
+            return [fn(request) for request in requests]
+        futures = [self.submit(fn, request) for request in requests]
+        return [future.result() for future in futures]
+    
+    def generate_batch(self, requests: List[Dict]) -> List:
+        """Run many generate_post_content() calls concurrently; results come back in request order.
+
+        Each request is a dict of generate_post_content() keyword arguments. A
+        request that fails yields its GenerationError in place of the content. At
+        most max_concurrency calls are in flight per process, shared by all callers,
+        and each runs with the caller's rate-limit priority.
+        """
+        return self._run_batch(self._generate_or_error, requests)
+    
+    def optimize_batch(self, requests: List[Dict]) -> List:
+        """optimize_content() for many posts concurrently, like generate_batch().
+
+        Each request is a dict of optimize_content() keyword arguments; failures
+        come back as GenerationError in place of the rewrite. Must not be called
+        from a generation thread: it waits on the same pool.
+        """
+        return self._run_batch(self._optimize_or_error, requests)
+    
+    def _bundle_prompt(self, topic: str, platforms: List[str], count: int) -> str:
+        tones = ", ".join(VARIANT_TONES[i % len(VARIANT_TONES)] for i in range(count))
+        lines = [
+            f"Write social media posts about '{topic}'.",
+            f"For each platform below write {count} distinct variant(s), using these tones in order: {tones}.",
+        ]
+        lines += [f"- {platform}: {PLATFORM_GUIDELINES.get(platform, PLATFORM_GUIDELINES['twitter'])}" for platform in platforms]
+        example = ", ".join(f'"{platform}": [{", ".join(["<post text>"] * count)}]' for platform in platforms)
+        lines.append(f"Reply with only a JSON object of this shape: {{{example}}}")
+        return "\n".join(lines)
+    
+    def _parse_bundle(self, content: str, platforms: List[str], count: int) -> Dict[str, List[str]]:
+        """Per-platform variants from a bundled reply; platforms with a missing or invalid entry are left out"""
+        start, end = content.find("{"), content.rfind("}")
+        try:
+            data = json.loads(content[start:end + 1]) if start != -1 else None
+        except ValueError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+
+        parsed = {}
+        for platform in platforms:
+            variants = data.get(platform)
+            if not isinstance(variants, list) or len(variants) < count:
+                continue
+            variants = [variant.strip() for variant in variants[:count] if isinstance(variant, str)]
+            max_length = PLATFORM_MAX_LENGTH.get(platform)
+            if len(variants) == count and all(variants) and all(max_length is None or len(v) <= max_length for v in variants):
+                parsed[platform] = variants
+        return parsed
+    
+    def generate_bundle(self, topic: str, platforms: List[str], count: int = 2,
+                        force_refresh: bool = False) -> Dict[str, List[str]]:
+        """All platforms' variants for a topic from a single JSON completion.
+
+        Only platforms whose variants parsed and validated are returned; replies
+        that don't fully validate are not cached. Raises GenerationError if the
+        call itself failed.
+        """
+        try:
+            content = self._chat_completion(
+                BUNDLE,
+                "You are a social media expert creating engaging content. You reply with JSON only.",
+                self._bundle_prompt(topic, platforms, count),
+                max_tokens=200 * len(platforms) * count + 50,
+                temperature=0.8,
+                force_refresh=force_refresh,
+                cacheable=lambda reply: len(self._parse_bundle(reply, platforms, count)) == len(platforms)
             )
-            return response.choices[0].message.content.strip()
+        except GenerationError:
+            raise
         except Exception as e:
-            return f"Error generating content: {str(e)}"
+            print(f"Bundled generation failed for {topic}: {e}")
+            return {}
+        return self._parse_bundle(content, platforms, count)
+    
+    def generate_topic_variants(self, topic: str, platforms: List[str], count: int = 2,
+                                force_refresh: bool = False) -> Dict[str, List[str]]:
+        """`count` A/B variants per platform for one topic.
+
+        Tries one bundled request for everything first; platforms it didn't
+        deliver valid variants for fall back to one concurrent call per variant.
+        Variants that still fail are GenerationError instances in the lists; if
+        the bundled call itself failed every variant is its error, rather than
+        retrying the same quota with one call each.
+        """
+        variants = {}
+        if OPENAI_BUNDLE_GENERATION and len(platforms) * count > 1:
+            try:
+                variants = self.generate_bundle(topic, platforms, count, force_refresh)
+            except GenerationError as e:
+                print(f"Generation failed for {topic}: {e}")
+                return {platform: [e] * count for platform in platforms}
+
+        missing = [platform for platform in platforms if platform not in variants]
+        if missing:
+            requests = [
+                {"topic": topic, "platform": platform, "tone": VARIANT_TONES[i % len(VARIANT_TONES)], "force_refresh": force_refresh}
+                for platform in missing
+                for i in range(count)
+            ]
+            contents = self.generate_batch(requests)
+            for index, platform in enumerate(missing):
+                variants[platform] = contents[index * count:(index + 1) * count]
+
+        return {platform: variants[platform] for platform in platforms}
     
     def generate_content_variants(self, topic: str, platform: str, count: int = 2) -> List[str]:
         """Generate multiple content variants for A/B testing"""
-        variants = []
-        for i in range(count):
-            tone = ["engaging", "professional", "witty", "informative"][i % 4]
-            content = self.generate_post_content(topic, platform, tone)
-            variants.append(content)
-        return variants
+        return self.generate_topic_variants(topic, [platform], count)[platform]
     
     def optimize_content(self, original_content: str, performance_data: Dict) -> str:
-        """Optimize content based on performance data"""
+        """Optimize content based on performance data; raises GenerationError on failure"""
         prompt = f"""
         Original post: "{original_content}"
         Performance: {performance_data.get('engagement_rate', 0)}% engagement rate
@@ -53,18 +483,12 @@ class OpenAIService:
         - More engaging tone
         """
         
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a social media optimization expert."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.8
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return original_content
+        return self._chat_completion(
+            REWRITE,
+            "You are a social media optimization expert.",
+            prompt,
+            max_tokens=200,
+            temperature=0.8
+        )
 
 openai_service = OpenAIService()
\ No newline at end of file
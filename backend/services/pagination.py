@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+# Labels of the keyset columns added to every projected list query
+CURSOR_TIME = "_cursor_time"
+CURSOR_ID = "_cursor_id"
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque cursor for the row after which the next page starts"""
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def keyset_page_query(query, model, time_column, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None, **equals):
+    """Newest-first page of `query` ordered on (time_column, id).
+
+    Keyword filters are equality matches on `model` columns (None = unfiltered).
+    The cursor is a row-value comparison, so with an index ending in
+    (time_column, id) every page is a single index range scan however deep it is.
+    One extra row is fetched to tell whether there is a next page.
+    """
+    for name, value in equals.items():
+        if value is not None:
+            query = query.where(getattr(model, name) == value)
+    if since is not None:
+        query = query.where(time_column >= since)
+    if until is not None:
+        query = query.where(time_column < until)
+    if cursor:
+        query = query.where(tuple_(time_column, model.id) < tuple_(*decode_cursor(cursor)))
+    return query.order_by(time_column.desc(), model.id.desc()).limit(limit + 1)
+
+def keyset_page(rows: List, limit: int = DEFAULT_PAGE_SIZE) -> Tuple[List, Optional[str]]:
+    """Drop the look-ahead row and build the cursor for the next page (None on the last page)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], CURSOR_TIME), getattr(rows[-1], CURSOR_ID))
+
+def parse_fields(fields, available: Dict) -> List[str]:
+    """Requested response fields in `available` order; all of them when `fields` is empty.
+
+    `fields` is a comma-separated string (as in ?fields=id,topic) or a list.
+    """
+    if not fields:
+        return list(available)
+    requested = fields.split(",") if isinstance(fields, str) else fields
+    requested = {name.strip() for name in requested if name.strip()}
+    unknown = requested - set(available)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (available: {', '.join(available)})")
+    return [name for name in available if name in requested]
+
+def projected_select(available: Dict, fields, time_column, id_column):
+    """select() of just the columns behind `fields` (labelled with the response names) plus the keyset columns.
+
+    Rows come back as plain tuples: no ORM identity map, and large columns such
+    as Post.content are only read when a client asks for them.
+    """
+    columns = [available[name].label(name) for name in parse_fields(fields, available)]
+    return select(*columns, time_column.label(CURSOR_TIME), id_column.label(CURSOR_ID))
+
+def project_row(row) -> Dict:
+    """Response dict for a projected_select() row"""
+    return {
+        name: value.isoformat() if isinstance(value, datetime) else value
+        for name, value in row._mapping.items()
+        if name not in (CURSOR_TIME, CURSOR_ID)
+    }
@@ -0,0 +1,135 @@
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+# Platforms to replace with a local stand-in that accepts every post without calling the platform,
+# e.g. PLATFORM_LOCAL_STANDINS=tiktok,youtube for development or load tests
+PLATFORM_LOCAL_STANDINS = [
+    name.strip() for name in os.getenv("PLATFORM_LOCAL_STANDINS", "").split(",") if name.strip()
+]
+
+class PlatformAdapter(ABC):
+    """What the agents need from a social platform, behind one contract.
+
+    publish() returns the platform service's result dict ({"success": True, ...}
+    or {"error": ...}); publish_batch() returns one such dict per content, in
+    order. fetch_metrics_batch() returns {post id: metrics} for the posts the
+    platform could measure; callers estimate the rest. trending() returns
+    [{"topic", "volume", "platform"}]; trending_async, when set, is its
+    coroutine variant for the event loop.
+    """
+
+    name: str = ""
+    trending_async: Optional[Callable] = None
+
+    def __init__(self, service=None):
+        self.service = service
+
+    def is_configured(self) -> bool:
+        return self.service is not None and self.service.is_configured()
+
+    @abstractmethod
+    def publish(self, content: str) -> Dict:
+        """Publish one post"""
+
+    def publish_batch(self, contents: List[str]) -> List[Dict]:
+        # No platform has a bulk publish endpoint yet: one call per post, failures don't stop the batch
+        results = []
+        for content in contents:
+            try:
+                results.append(self.publish(content))
+            except Exception as e:
+                results.append({"error": f"Failed to post to {self.name}: {e}"})
+        return results
+
+    def fetch_metrics_batch(self, posts: List) -> Dict[int, Dict]:
+        return {}
+
+    def trending(self) -> List[Dict]:
+        return self.service.get_trending_topics()
+
+class TwitterAdapter(PlatformAdapter):
+    name = "twitter"
+
+    def publish(self, content: str) -> Dict:
+        return self.service.post_tweet(content)
+
+class LinkedInAdapter(PlatformAdapter):
+    name = "linkedin"
+
+    def publish(self, content: str) -> Dict:
+        return self.service.post_update(content)
+
+class InstagramAdapter(PlatformAdapter):
+    name = "instagram"
+
+    def publish(self, content: str) -> Dict:
+        return self.service.post_caption(content)
+
+class TikTokAdapter(PlatformAdapter):
+    name = "tiktok"
+
+    def publish(self, content: str) -> Dict:
+        return self.service.post_video(content)
+
+class YouTubeAdapter(PlatformAdapter):
+    name = "youtube"
+
+    @property
+    def trending_async(self) -> Optional[Callable]:
+        return self.service.get_trending_topics_async if self.service is not None else None
+
+    def publish(self, content: str) -> Dict:
+        return self.service.post_video("TrendPulse Content", content)
+
+class RedditAdapter(PlatformAdapter):
+    name = "reddit"
+
+    def publish(self, content: str) -> Dict:
+        return self.service.post_to_subreddit("technology", "TrendPulse Update", content)
+
+class LocalStandInAdapter(PlatformAdapter):
+    """Accepts every post and keeps it in memory; trends come from the replaced adapter, if any"""
+
+    def __init__(self, name: str, replaced: Optional[PlatformAdapter] = None):
+        super().__init__(replaced.service if replaced else None)
+        self.name = name
+        self.replaced = replaced
+        self.published: List[Dict] = []
+
+    def is_configured(self) -> bool:
+        return True
+
+    def publish(self, content: str) -> Dict:
+        result = {"success": True, "post_id": f"local-{uuid.uuid4().hex[:12]}", "text": content,
+                  "platform": self.name, "local": True}
+        self.published.append(result)
+        return result
+
+    def trending(self) -> List[Dict]:
+        return self.replaced.trending() if self.replaced else []
+
+class PlatformRegistry:
+    """Platform adapters by name, in registration order"""
+
+    def __init__(self):
+        self._adapters: Dict[str, PlatformAdapter] = {}
+
+    def register(self, adapter: PlatformAdapter) -> PlatformAdapter:
+        """Add a platform, or replace the adapter registered under the same name"""
+        self._adapters[adapter.name] = adapter
+        return adapter
+
+    def get(self, name: str) -> Optional[PlatformAdapter]:
+        return self._adapters.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._adapters)
+
+    def adapters(self) -> List[PlatformAdapter]:
+        return list(self._adapters.values())
+
+    def use_local_standins(self, names: List[str]):
+        for name in names:
+            self.register(LocalStandInAdapter(name, self._adapters.get(name)))
@@ -0,0 +1,155 @@
+import contextvars
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from redis.exceptions import RedisError
+
+from services.redis_client import get_redis, key
+
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "30000"))
+# Share of both buckets background work must leave free for interactive requests
+OPENAI_INTERACTIVE_RESERVE = float(os.getenv("OPENAI_INTERACTIVE_RESERVE", "0.2"))
+# Longest a call waits for capacity before giving up
+OPENAI_RATE_LIMIT_TIMEOUT = float(os.getenv("OPENAI_RATE_LIMIT_TIMEOUT", "60"))
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Priority of LLM calls made in the current context; API handlers raise it to INTERACTIVE
+_priority = contextvars.ContextVar("llm_priority", default=BACKGROUND)
+
+@contextmanager
+def llm_priority(lane: str):
+    token = _priority.set(lane)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> str:
+    return _priority.get()
+
+# Two token buckets (requests, tokens) refilled continuously at their per-minute rate.
+# Takes 1 request and ARGV[3] tokens if both buckets can afford it while keeping
+# ARGV[4] (a fraction of capacity) in reserve; otherwise returns the seconds to wait.
+_ACQUIRE = """
+local now = redis.call('time')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rpm, tpm = tonumber(ARGV[1]), tonumber(ARGV[2])
+local cost, reserve = tonumber(ARGV[3]), tonumber(ARGV[4])
+
+local function level(bucket, capacity)
+    local state = redis.call('hmget', bucket, 'level', 'ts')
+    local current = tonumber(state[1]) or capacity
+    local since = tonumber(state[2]) or now
+    return math.min(capacity, current + (now - since) * capacity / 60)
+end
+
+local requests = level(KEYS[1], rpm)
+local tokens = level(KEYS[2], tpm)
+local wait = math.max(
+    (1 + rpm * reserve - requests) * 60 / rpm,
+    (math.min(cost, tpm) + tpm * reserve - tokens) * 60 / tpm,
+    0
+)
+if wait > 0 then
+    return tostring(wait)
+end
+
+redis.call('hset', KEYS[1], 'level', requests - 1, 'ts', now)
+redis.call('hset', KEYS[2], 'level', tokens - cost, 'ts', now)
+redis.call('expire', KEYS[1], 120)
+redis.call('expire', KEYS[2], 120)
+return '0'
+"""
+
+# Give back (or charge) ARGV[1] tokens once a request's real usage is known, never above capacity ARGV[2].
+# A bucket that already expired is left alone: it refills to capacity anyway.
+_SETTLE = """
+local current = tonumber(redis.call('hget', KEYS[1], 'level'))
+if current then
+    redis.call('hset', KEYS[1], 'level', math.min(tonumber(ARGV[2]), current + tonumber(ARGV[1])))
+end
+return 0
+"""
+
+class RateLimitTimeout(Exception):
+    pass
+
+class TokenBucketLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by every process through Redis.
+
+    Callers estimate a request's tokens up front, acquire() before calling the
+    API and settle() with the real usage afterwards. Background calls leave
+    OPENAI_INTERACTIVE_RESERVE of each bucket untouched, so a manual generation
+    from the dashboard gets through even while the beat tasks saturate the quota.
+    If Redis is unreachable calls are let through unthrottled.
+    """
+
+    def __init__(self, name: str = "openai", rpm: int = OPENAI_RPM_LIMIT, tpm: int = OPENAI_TPM_LIMIT,
+                 reserve: float = OPENAI_INTERACTIVE_RESERVE, timeout: float = OPENAI_RATE_LIMIT_TIMEOUT):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.reserve = reserve
+        self.timeout = timeout
+        self._requests_key = key("ratelimit", name, "requests")
+        self._tokens_key = key("ratelimit", name, "tokens")
+
+    def acquire(self, tokens: int, priority: str = None, timeout: float = None):
+        """Block until the request fits in both buckets.
+
+        Raises RateLimitTimeout after `timeout` seconds (the caller's remaining
+        latency budget), or the limiter's own timeout if that is shorter.
+        """
+        priority = priority or current_priority()
+        reserve = 0.0 if priority == INTERACTIVE else self.reserve
+        timeout = self.timeout if timeout is None else max(0.0, min(timeout, self.timeout))
+        deadline = time.monotonic() + timeout
+
+        while True:
+            try:
+                wait = float(get_redis().eval(
+                    _ACQUIRE, 2, self._requests_key, self._tokens_key, self.rpm, self.tpm, tokens, reserve
+                ))
+            except RedisError as e:
+                print(f"Rate limiter unavailable, not throttling: {e}")
+                return
+            if wait <= 0:
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RateLimitTimeout(f"No {priority} OpenAI capacity for {tokens} tokens within {timeout:g}s")
+            # Jitter so waiting processes don't all retry at the same instant
+            time.sleep(min(remaining, wait * random.uniform(1.0, 1.3) + 0.01))
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket once the real usage of a request is known"""
+        if actual is None or actual == estimated:
+            return
+        try:
+            get_redis().eval(_SETTLE, 1, self._tokens_key, estimated - actual, self.tpm)
+        except RedisError:
+            pass
+
+    def status(self) -> Dict:
+        try:
+            requests, tokens = get_redis().pipeline(transaction=False) \
+                .hget(self._requests_key, "level").hget(self._tokens_key, "level").execute()
+        except RedisError as e:
+            return {"error": str(e)}
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "interactive_reserve": self.reserve,
+            # Levels as of the last acquire; buckets refill continuously from there
+            "requests_level": float(requests) if requests is not None else self.rpm,
+            "tokens_level": float(tokens) if tokens is not None else self.tpm,
+        }
+
+# Create global instance
+openai_rate_limiter = TokenBucketLimiter()
@@ -0,0 +1,39 @@
+import os
+
+import redis
+import redis.asyncio as aioredis
+
+# Same Redis as the Celery broker; app keys are namespaced under "trendpulse:"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6380/0")
+KEY_PREFIX = "trendpulse:"
+
+# Fail fast: Redis is an optimisation for these callers, never a hard dependency
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0"))
+
+_client = None
+_async_client = None
+
+def get_redis() -> redis.Redis:
+    """Shared blocking client (redis-py reconnects by itself after a fork)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            REDIS_URL,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        )
+    return _client
+
+def get_async_redis() -> aioredis.Redis:
+    """Shared asyncio client for the API process"""
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(
+            REDIS_URL,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        )
+    return _async_client
+
+def key(*parts) -> str:
+    return KEY_PREFIX + ":".join(str(part) for part in parts)
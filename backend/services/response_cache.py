@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from services.redis_client import get_redis, get_async_redis, key
+
+# Entries are replaced by the agents as soon as they write, so the TTL only bounds
+# how long an entry nobody refreshes can live
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "900"))
+# How long one process may hold a fill lock before the others stop waiting for it
+RESPONSE_CACHE_LOCK_TIMEOUT = float(os.getenv("RESPONSE_CACHE_LOCK_TIMEOUT", "10"))
+LOCK_POLL_INTERVAL = 0.05
+
+# Read the generation and the entry it points at in one round trip
+_LOOKUP = """
+local generation = redis.call('get', KEYS[1]) or '0'
+return {generation, redis.call('get', ARGV[1] .. generation .. ':' .. ARGV[2])}
+"""
+
+# Bump the generation and store the fresh entry under it atomically
+_REPLACE = """
+local generation = redis.call('incr', KEYS[1])
+redis.call('set', ARGV[1] .. generation .. ':' .. ARGV[2], ARGV[3], 'EX', ARGV[4])
+return generation
+"""
+
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class ResponseCache:
+    """JSON bodies of the dashboard GET endpoints, cached in Redis.
+
+    Entries live at trendpulse:cache:<endpoint>:<generation>:<params digest>.
+    Agents bump an endpoint's generation after they commit (optionally storing
+    the fresh default response under the new generation), which retires every
+    cached variant at once; a slow fill that started before the bump writes
+    under the old generation and is never read.
+
+    Concurrent misses are coalesced: requests in one process share a single
+    fill, and across processes a short Redis lock lets one fill while the
+    others poll for its result. If Redis is unreachable requests go straight
+    to the database.
+    """
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = RESPONSE_CACHE_TTL if ttl is None else ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _generation_key(self, endpoint: str) -> str:
+        return key("cache", endpoint, "generation")
+
+    def _entry_prefix(self, endpoint: str) -> str:
+        return key("cache", endpoint, "")
+
+    def _params_digest(self, params: Optional[Dict]) -> str:
+        if not params:
+            return "default"
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+    async def get_or_load(self, endpoint: str, loader: Callable[[], Awaitable[Any]], params: Optional[Dict] = None):
+        """Cached response for endpoint+params, calling `loader` (at most once per key) on a miss"""
+        digest = self._params_digest(params)
+        try:
+            generation, cached = await get_async_redis().eval(
+                _LOOKUP, 1, self._generation_key(endpoint), self._entry_prefix(endpoint), digest
+            )
+        except RedisError as e:
+            print(f"Response cache unavailable: {e}")
+            self._count("errors")
+            return await loader()
+
+        if cached is not None:
+            self._count("hits")
+            return json.loads(cached)
+
+        entry_key = f"{self._entry_prefix(endpoint)}{generation.decode()}:{digest}"
+        inflight = self._inflight.get(entry_key)
+        if inflight is not None:
+            self._count("coalesced")
+        else:
+            self._count("misses")
+            inflight = asyncio.ensure_future(self._fill(entry_key, loader))
+            self._inflight[entry_key] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(entry_key, None))
+        # A disconnecting client must not cancel the fill other requests are waiting on
+        return await asyncio.shield(inflight)
+
+    async def _fill(self, entry_key: str, loader: Callable[[], Awaitable[Any]]):
+        redis = get_async_redis()
+        lock_key = f"{entry_key}:lock"
+        token = uuid.uuid4().hex
+        locked = False
+
+        try:
+            locked = await redis.set(lock_key, token, nx=True, px=int(RESPONSE_CACHE_LOCK_TIMEOUT * 1000))
+            if not locked:
+                # Another process is already loading this entry; wait for it instead of querying too
+                deadline = time.monotonic() + RESPONSE_CACHE_LOCK_TIMEOUT
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+                    cached, lock_held = await redis.pipeline(transaction=False).get(entry_key).exists(lock_key).execute()
+                    if cached is not None:
+                        return json.loads(cached)
+                    if not lock_held:
+                        break
+        except RedisError as e:
+            print(f"Response cache lock failed: {e}")
+            self._count("errors")
+
+        try:
+            value = await loader()
+            try:
+                await redis.set(entry_key, json.dumps(value), ex=self.ttl)
+            except RedisError as e:
+                print(f"Response cache write failed: {e}")
+                self._count("errors")
+            return value
+        finally:
+            if locked:
+                try:
+                    await redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+                except RedisError:
+                    pass
+
+    def invalidate(self, *endpoints: str):
+        """Retire every cached variant of `endpoints`; call after the write has committed"""
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for endpoint in endpoints:
+                pipe.incr(self._generation_key(endpoint))
+            pipe.execute()
+        except RedisError as e:
+            print(f"Response cache invalidation failed for {endpoints}: {e}")
+            self._count("errors")
+
+    def refresh(self, endpoint: str, loader: Callable[[], Any]):
+        """Invalidate `endpoint` and store loader()'s result as its default (no-params) entry"""
+        try:
+            body = json.dumps(loader())
+        except Exception as e:
+            print(f"Response cache refresh of {endpoint} failed: {e}")
+            self.invalidate(endpoint)
+            return
+
+        try:
+            get_redis().eval(
+                _REPLACE, 1, self._generation_key(endpoint),
+                self._entry_prefix(endpoint), self._params_digest(None), body, self.ttl,
+            )
+        except RedisError as e:
+            print(f"Response cache refresh of {endpoint} failed: {e}")
+            self._count("errors")
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0
+        stats["ttl"] = self.ttl
+        return stats
+
+# Create global instance
+response_cache = ResponseCache()
@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict
+
+from redis.exceptions import RedisError
+
+from services.redis_client import get_redis, key
+
+# How long a shared call's lock outlives its process; the leader extends it every third of this while it runs
+SINGLEFLIGHT_LOCK_TTL = float(os.getenv("SINGLEFLIGHT_LOCK_TTL", "30"))
+# How long a finished call's result stays readable for callers that subscribed late
+SINGLEFLIGHT_RESULT_TTL = 30
+POLL_INTERVAL = 0.5
+
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_EXTEND_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Returned by _follow() when the leader went away without a result for us
+_RETRY = object()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    Threads of one process wait on the first caller's call. Across processes the
+    first caller takes a Redis lock (SET NX with a token), keeps extending it
+    while the call runs, and publishes the JSON result on a channel when it
+    finishes; callers elsewhere subscribe and return that result instead of
+    running the call again, for as long as the call takes. If the leader fails
+    or its process dies (the lock expires), a waiting caller takes over.
+    Without Redis calls only coalesce within the process. Results must be
+    JSON-serializable.
+    """
+
+    def __init__(self, name: str, lock_ttl: float = SINGLEFLIGHT_LOCK_TTL):
+        self.name = name
+        self.lock_ttl = lock_ttl
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def _keys(self, flight_key: str):
+        return (
+            key("singleflight", self.name, flight_key, "lock"),
+            key("singleflight", self.name, flight_key, "result"),
+            key("singleflight", self.name, flight_key, "done"),
+        )
+
+    def do(self, flight_key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(flight_key)
+            leader = call is None
+            if leader:
+                call = self._calls[flight_key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(flight_key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[flight_key]
+            call.done.set()
+
+    def running(self, flight_key: str) -> bool:
+        """Whether a call with this key is in flight in any process"""
+        if flight_key in self._calls:
+            return True
+        try:
+            return bool(get_redis().exists(self._keys(flight_key)[0]))
+        except RedisError:
+            return False
+
+    def _do_shared(self, flight_key: str, fn: Callable[[], Any]) -> Any:
+        lock_key = self._keys(flight_key)[0]
+        while True:
+            token = uuid.uuid4().hex
+            try:
+                redis = get_redis()
+                leading = redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+                leader_token = None if leading else redis.get(lock_key)
+            except RedisError as e:
+                print(f"Singleflight lock failed for {flight_key}: {e}")
+                return fn()
+
+            if leading:
+                return self._lead(redis, flight_key, token, fn)
+            if leader_token is None:
+                # The leader just finished or gave up; try to take over
+                continue
+            result = self._follow(redis, flight_key, leader_token.decode())
+            if result is not _RETRY:
+                return result
+
+    def _lead(self, redis, flight_key: str, token: str, fn: Callable[[], Any]) -> Any:
+        """Run the call while holding the lock; Redis failures from here on never run it again"""
+        lock_key, result_key, channel = self._keys(flight_key)
+        stop = threading.Event()
+        threading.Thread(target=self._keep_alive, args=(redis, lock_key, token, stop), daemon=True).start()
+        try:
+            result = fn()
+        except Exception:
+            stop.set()
+            # Waiters wake up and one of them runs the call itself
+            self._finish(redis, lock_key, token, channel, json.dumps({"token": token}))
+            raise
+        stop.set()
+        payload = json.dumps({"token": token, "result": result})
+        try:
+            redis.set(result_key, payload, ex=SINGLEFLIGHT_RESULT_TTL)
+        except RedisError as e:
+            print(f"Singleflight result write failed for {flight_key}: {e}")
+        self._finish(redis, lock_key, token, channel, payload)
+        return result
+
+    def _keep_alive(self, redis, lock_key: str, token: str, stop: threading.Event):
+        """Extend the lock until `stop` is set, so waiters keep waiting however long the call runs"""
+        while not stop.wait(self.lock_ttl / 3):
+            try:
+                if not redis.eval(_EXTEND_LOCK, 1, lock_key, token, int(self.lock_ttl * 1000)):
+                    return
+            except RedisError as e:
+                print(f"Singleflight lock extension failed for {lock_key}: {e}")
+
+    def _finish(self, redis, lock_key: str, token: str, channel: str, payload: str):
+        try:
+            redis.publish(channel, payload)
+            redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+        except RedisError as e:
+            print(f"Singleflight release failed for {lock_key}: {e}")
+
+    def _follow(self, redis, flight_key: str, leader_token: str) -> Any:
+        """Wait for the leader holding `leader_token` to publish; _RETRY if it went away without a result"""
+        lock_key, result_key, channel = self._keys(flight_key)
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(channel)
+            while True:
+                # Also covers a result published before we subscribed
+                stored, holder = redis.pipeline(transaction=False).get(result_key).get(lock_key).execute()
+                payload = json.loads(stored) if stored else None
+                if payload and payload["token"] == leader_token:
+                    return payload["result"]
+                if holder is None or holder.decode() != leader_token:
+                    return _RETRY
+
+                message = pubsub.get_message(timeout=POLL_INTERVAL)
+                if message is not None:
+                    payload = json.loads(message["data"])
+                    if payload["token"] == leader_token:
+                        return payload["result"] if "result" in payload else _RETRY
+        except RedisError as e:
+            print(f"Singleflight wait failed for {flight_key}: {e}")
+            return _RETRY
+        finally:
+            pubsub.close()
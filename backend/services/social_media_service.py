@@ -1,9 +1,62 @@
 import tweepy
-import requests
+import asyncio
 import os
-from typing import List, Dict, Optional
+import threading
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
 import json
+from services.http_client import HTTP_READ_TIMEOUT, http_client
+from services.identity_cache import identity_cache
+from services.platform_adapters import (
+    PLATFORM_LOCAL_STANDINS, InstagramAdapter, LinkedInAdapter, PlatformRegistry, RedditAdapter, TikTokAdapter,
+    TwitterAdapter, YouTubeAdapter,
+)
+
+# Longest a fan-out waits for one platform (seconds); PLATFORM_TIMEOUT_<PLATFORM> overrides it per platform
+PLATFORM_TIMEOUT = float(os.getenv("PLATFORM_TIMEOUT", "15"))
+# Threads for concurrent platform calls, per process
+PLATFORM_FANOUT_WORKERS = int(os.getenv("PLATFORM_FANOUT_WORKERS", "12"))
+
+def platform_timeout(platform: str) -> float:
+    return float(os.getenv(f"PLATFORM_TIMEOUT_{platform.upper()}", PLATFORM_TIMEOUT))
+
+def _timed(fn: Callable):
+    """fn()'s result (or exception) and how long it took, measured on the worker thread"""
+    started = time.monotonic()
+    try:
+        return fn(), None, time.monotonic() - started
+    except Exception as e:
+        return None, e, time.monotonic() - started
+
+def _outcome(platform: str, result=None, error: Optional[Exception] = None, seconds: float = 0.0,
+             timed_out: bool = False) -> Dict:
+    if timed_out:
+        return {"error": f"{platform} did not respond within {seconds:g}s", "timed_out": True,
+                "latency_ms": round(seconds * 1000, 1)}
+    if error is not None:
+        return {"error": str(error), "latency_ms": round(seconds * 1000, 1)}
+    return {"result": result, "latency_ms": round(seconds * 1000, 1)}
+
+class _PooledSession:
+    """Makes a tweepy client send its requests through this process's shared HTTP session"""
+
+    @property
+    def session(self):
+        return http_client.session()
+
+    @session.setter
+    def session(self, value):
+        # tweepy assigns its own requests.Session in __init__; keep ours
+        pass
+
+class PooledTwitterAPI(_PooledSession, tweepy.API):
+    pass
+
+class PooledTwitterClient(_PooledSession, tweepy.Client):
+    pass
 
 class TwitterService:
     def __init__(self):
@@ -17,8 +70,8 @@ class TwitterService:
         if all([self.api_key, self.api_secret, self.access_token, self.access_token_secret]):
             auth = tweepy.OAuthHandler(self.api_key, self.api_secret)
             auth.set_access_token(self.access_token, self.access_token_secret)
-            self.api = tweepy.API(auth)
-            self.client = tweepy.Client(
+            self.api = PooledTwitterAPI(auth, timeout=HTTP_READ_TIMEOUT)
+            self.client = PooledTwitterClient(
                 bearer_token=self.bearer_token,
                 consumer_key=self.api_key,
                 consumer_secret=self.api_secret,
@@ -81,24 +134,29 @@ class LinkedInService:
     def is_configured(self) -> bool:
         return bool(self.access_token)
     
+    def _fetch_author_urn(self) -> Optional[str]:
+        profile_response = http_client.get(
+            f"{self.base_url}/me",
+            headers={"Authorization": f"Bearer {self.access_token}"}
+        )
+        if profile_response.status_code != 200:
+            return None
+        return f"urn:li:person:{profile_response.json()['id']}"
+    
+    def author_urn(self) -> Optional[str]:
+        """The token owner's person URN, looked up once per access token"""
+        return identity_cache.get_or_resolve("linkedin", self.access_token, self._fetch_author_urn)
+    
     def post_update(self, text: str, visibility: str = "PUBLIC") -> Dict:
         """Post an update to LinkedIn"""
         if not self.is_configured():
             return {"error": "LinkedIn not configured"}
         
         try:
-            # First, get the user's profile ID
-            profile_response = requests.get(
-                f"{self.base_url}/me",
-                headers={"Authorization": f"Bearer {self.access_token}"}
-            )
-            
-            if profile_response.status_code != 200:
+            author_id = self.author_urn()
+            if author_id is None:
                 return {"error": "Failed to get LinkedIn profile"}
             
-            profile_data = profile_response.json()
-            author_id = f"urn:li:person:{profile_data['id']}"
-            
             # Create the post
             post_data = {
                 "author": author_id,
@@ -116,7 +174,7 @@ class LinkedInService:
                 }
             }
             
-            response = requests.post(
+            response = http_client.post(
                 f"{self.base_url}/ugcPosts",
                 headers={
                     "Authorization": f"Bearer {self.access_token}",
@@ -133,6 +191,10 @@ class LinkedInService:
                     "text": text,
                     "platform": "linkedin"
                 }
+            elif response.status_code == 401:
+                # Revoked or replaced token: resolve the author again next time
+                identity_cache.invalidate("linkedin", self.access_token)
+                return {"error": f"Failed to post to LinkedIn: {response.text}"}
             else:
                 return {"error": f"Failed to post to LinkedIn: {response.text}"}
                 
@@ -163,7 +225,29 @@ class InstagramService:
         self.base_url = "https://graph.facebook.com/v18.0"
     
     def is_configured(self) -> bool:
-        return bool(self.access_token and self.instagram_business_account_id)
+        return bool(self.access_token)
+    
+    def _fetch_business_account_id(self) -> Optional[str]:
+        # The Instagram account linked to one of the token's Facebook pages
+        response = http_client.get(
+            f"{self.base_url}/me/accounts",
+            params={"fields": "instagram_business_account", "access_token": self.access_token}
+        )
+        if response.status_code == 401:
+            identity_cache.invalidate("instagram", self.access_token)
+        if response.status_code != 200:
+            return None
+        for page in response.json().get("data", []):
+            account = page.get("instagram_business_account")
+            if account:
+                return account["id"]
+        return None
+    
+    def business_account_id(self) -> Optional[str]:
+        """INSTAGRAM_BUSINESS_ACCOUNT_ID, else looked up from the access token once per token"""
+        if self.instagram_business_account_id:
+            return self.instagram_business_account_id
+        return identity_cache.get_or_resolve("instagram", self.access_token, self._fetch_business_account_id)
     
     def post_caption(self, caption: str) -> Dict:
         """Post a caption to Instagram (requires media upload first)"""
@@ -173,6 +257,10 @@ class InstagramService:
         # Note: Instagram requires media for posts, so this is a simplified version
         # In a real implementation, you'd need to handle media upload first
         try:
+            account_id = self.business_account_id()
+            if account_id is None:
+                return {"error": "No Instagram business account linked to the access token"}
+            
             # For now, we'll just return a success message
             # In practice, you'd need to:
             # 1. Upload media first
@@ -182,6 +270,7 @@ class InstagramService:
             return {
                 "success": True,
                 "message": "Instagram post would be created (requires media upload)",
+                "account_id": account_id,
                 "caption": caption,
                 "platform": "instagram"
             }
@@ -263,6 +352,9 @@ class TikTokService:
             return []
 
 class YouTubeService:
+    # What _get_access_token returns until OAuth2 refresh is implemented
+    SIMULATED_ACCESS_TOKEN = "simulated_access_token"
+    
     def __init__(self):
         self.api_key = os.getenv("YOUTUBE_API_KEY")
         self.client_id = os.getenv("YOUTUBE_CLIENT_ID")
@@ -273,6 +365,29 @@ class YouTubeService:
     def is_configured(self) -> bool:
         return bool(self.api_key and self.client_id and self.client_secret)
     
+    def _fetch_channel_id(self, access_token: str) -> Optional[str]:
+        response = http_client.get(
+            f"{self.base_url}/channels",
+            params={"part": "id", "mine": "true"},
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        if response.status_code == 401:
+            identity_cache.invalidate("youtube", access_token)
+        if response.status_code != 200:
+            return None
+        channels = response.json().get("items", [])
+        return channels[0]["id"] if channels else None
+    
+    def channel_id(self, access_token: str) -> Optional[str]:
+        """The token owner's channel, looked up once per real access token; None if unknown"""
+        if not access_token or access_token == self.SIMULATED_ACCESS_TOKEN:
+            return None
+        try:
+            return identity_cache.get_or_resolve("youtube", access_token, lambda: self._fetch_channel_id(access_token))
+        except Exception as e:
+            print(f"Error looking up YouTube channel: {e}")
+            return None
+    
     def post_video(self, title: str, description: str, video_path: str = None) -> Dict:
         """Post video to YouTube using YouTube Data API v3"""
         if not self.is_configured():
@@ -281,8 +396,12 @@ class YouTubeService:
         try:
             # YouTube API requires OAuth2 for uploading videos
             # This is a simplified implementation
+            access_token = self._get_access_token()
+            # The channel only labels the result; publishing doesn't wait on it
+            channel_id = self.channel_id(access_token)
+            
             headers = {
-                "Authorization": f"Bearer {self._get_access_token()}",
+                "Authorization": f"Bearer {access_token}",
                 "Content-Type": "application/json"
             }
             
@@ -291,7 +410,7 @@ class YouTubeService:
             # 1. Upload video file to YouTube
             # 2. Set video metadata (title, description, etc.)
             
-            return {
+            result = {
                 "success": True,
                 "message": "YouTube video would be uploaded (video file required)",
                 "title": title,
@@ -299,6 +418,9 @@ class YouTubeService:
                 "platform": "youtube",
                 "video_id": "simulated_video_id"
             }
+            if channel_id:
+                result["channel_id"] = channel_id
+            return result
         except Exception as e:
             return {"error": f"Failed to post to YouTube: {str(e)}"}
     
@@ -306,11 +428,52 @@ class YouTubeService:
         """Get OAuth2 access token using refresh token"""
         try:
             # In production, implement OAuth2 token refresh
-            return "simulated_access_token"
+            return self.SIMULATED_ACCESS_TOKEN
         except Exception as e:
             print(f"Error getting YouTube access token: {e}")
             return ""
     
+    def _trending_params(self) -> Dict:
+        return {
+            "part": "snippet",
+            "chart": "mostPopular",
+            "regionCode": "US",
+            "maxResults": 10,
+            "key": self.api_key
+        }
+    
+    def _parse_trending(self, status_code: int, data: Optional[Dict]) -> List[Dict]:
+        if status_code == 200:
+            trending_topics = []
+            
+            for video in data.get("items", []):
+                snippet = video.get("snippet", {})
+                title = snippet.get("title", "")
+                
+                # Extract hashtags from title
+                hashtags = [word for word in title.split() if word.startswith("#")]
+                if hashtags:
+                    trending_topics.append({
+                        "topic": hashtags[0],
+                        "volume": 5000 + (hash(hashtags[0]) % 8000),
+                        "platform": "youtube"
+                    })
+            
+            return trending_topics[:5]
+        else:
+            # Fallback to simulated data
+            trending_hashtags = [
+                "#shorts", "#viral", "#trending", "#youtube", "#subscribe", "#newvideo", "#fyp"
+            ]
+            return [
+                {
+                    "topic": hashtag,
+                    "volume": 6000 + (hash(hashtag) % 8000),
+                    "platform": "youtube"
+                }
+                for hashtag in trending_hashtags[:5]
+            ]
+    
     def get_trending_topics(self) -> List[Dict]:
         """Get trending topics from YouTube"""
         try:
@@ -318,47 +481,20 @@ class YouTubeService:
                 return []
             
             # Use YouTube Data API to get trending videos
-            url = f"{self.base_url}/videos"
-            params = {
-                "part": "snippet",
-                "chart": "mostPopular",
-                "regionCode": "US",
-                "maxResults": 10,
-                "key": self.api_key
-            }
+            response = http_client.get(f"{self.base_url}/videos", params=self._trending_params())
+            return self._parse_trending(response.status_code, response.json() if response.status_code == 200 else None)
+        except Exception as e:
+            print(f"Error fetching YouTube trends: {e}")
+            return []
+    
+    async def get_trending_topics_async(self) -> List[Dict]:
+        """get_trending_topics() on the event loop, through the shared async client"""
+        try:
+            if not self.api_key:
+                return []
             
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                trending_topics = []
-                
-                for video in data.get("items", []):
-                    snippet = video.get("snippet", {})
-                    title = snippet.get("title", "")
-                    
-                    # Extract hashtags from title
-                    hashtags = [word for word in title.split() if word.startswith("#")]
-                    if hashtags:
-                        trending_topics.append({
-                            "topic": hashtags[0],
-                            "volume": 5000 + (hash(hashtags[0]) % 8000),
-                            "platform": "youtube"
-                        })
-                
-                return trending_topics[:5]
-            else:
-                # Fallback to simulated data
-                trending_hashtags = [
-                    "#shorts", "#viral", "#trending", "#youtube", "#subscribe", "#newvideo", "#fyp"
-                ]
-                return [
-                    {
-                        "topic": hashtag,
-                        "volume": 6000 + (hash(hashtag) % 8000),
-                        "platform": "youtube"
-                    }
-                    for hashtag in trending_hashtags[:5]
-                ]
+            response = await http_client.aget(f"{self.base_url}/videos", params=self._trending_params())
+            return self._parse_trending(response.status_code, response.json() if response.status_code == 200 else None)
         except Exception as e:
             print(f"Error fetching YouTube trends: {e}")
             return []
@@ -449,34 +585,113 @@ class SocialMediaService:
         self.tiktok = TikTokService()
         self.youtube = YouTubeService()
         self.reddit = RedditService()
+        # Publishing, metrics and trends go through these adapters; register() one to add a platform
+        self.platforms = PlatformRegistry()
+        for adapter in (TwitterAdapter(self.twitter), LinkedInAdapter(self.linkedin), InstagramAdapter(self.instagram),
+                        TikTokAdapter(self.tiktok), YouTubeAdapter(self.youtube), RedditAdapter(self.reddit)):
+            self.platforms.register(adapter)
+        self.platforms.use_local_standins(PLATFORM_LOCAL_STANDINS)
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+    
+    def _pool(self) -> ThreadPoolExecutor:
+        """This process's fan-out threads (threads don't survive a fork, so each child makes its own)"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._executor_lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=PLATFORM_FANOUT_WORKERS, thread_name_prefix="platform")
+                    self._executor_pid = os.getpid()
+        return self._executor
+    
+    def _fan_out(self, calls: Dict[str, Callable]) -> Dict[str, Dict]:
+        """Run one call per platform concurrently, each bounded by its platform's timeout.
+
+        Returns {platform: {"result" | "error", "latency_ms", ["timed_out"]}}. A
+        call that times out keeps running on its thread (the HTTP timeouts end
+        it); only its own entry reports the timeout.
+        """
+        started = time.monotonic()
+        futures = {platform: self._pool().submit(_timed, fn) for platform, fn in calls.items()}
+        outcomes = {}
+        for platform, future in futures.items():
+            timeout = platform_timeout(platform)
+            try:
+                result, error, seconds = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+                outcomes[platform] = _outcome(platform, result, error, seconds)
+            except FutureTimeoutError:
+                future.cancel()
+                outcomes[platform] = _outcome(platform, seconds=timeout, timed_out=True)
+        return outcomes
+    
+    async def _fan_out_async(self, calls: Dict[str, Callable]) -> Dict[str, Dict]:
+        """_fan_out() on the event loop: coroutine functions run on it, blocking calls on the fan-out threads"""
+        loop = asyncio.get_running_loop()
+        
+        async def run(platform: str, fn: Callable):
+            timeout = platform_timeout(platform)
+            started = time.monotonic()
+            work = fn() if asyncio.iscoroutinefunction(fn) else loop.run_in_executor(self._pool(), fn)
+            try:
+                result = await asyncio.wait_for(work, timeout)
+            except asyncio.TimeoutError:
+                return platform, _outcome(platform, seconds=timeout, timed_out=True)
+            except Exception as e:
+                return platform, _outcome(platform, error=e, seconds=time.monotonic() - started)
+            return platform, _outcome(platform, result, seconds=time.monotonic() - started)
+        
+        return dict(await asyncio.gather(*(run(platform, fn) for platform, fn in calls.items())))
+    
+    def _post_calls(self, content: str, platforms: List[str]) -> Dict[str, Callable]:
+        return {
+            adapter.name: partial(adapter.publish, content) for adapter in self.platforms.adapters()
+            if adapter.name in platforms and adapter.is_configured()
+        }
     
     def post_to_all_platforms(self, content: str, platforms: List[str] = None) -> Dict:
+        """Post to every configured platform in `platforms` concurrently.
+
+        Each platform's result carries its latency_ms; a platform that doesn't
+        answer within its timeout reports an error with "timed_out" (its post
+        may still go through).
+        """
         if platforms is None:
-            platforms = ["twitter", "linkedin", "instagram", "tiktok", "youtube", "reddit"]
+            platforms = self.platforms.names()
         results = {}
-        if "twitter" in platforms and self.twitter.is_configured():
-            results["twitter"] = self.twitter.post_tweet(content)
-        if "linkedin" in platforms and self.linkedin.is_configured():
-            results["linkedin"] = self.linkedin.post_update(content)
-        if "instagram" in platforms and self.instagram.is_configured():
-            results["instagram"] = self.instagram.post_caption(content)
-        if "tiktok" in platforms and self.tiktok.is_configured():
-            results["tiktok"] = self.tiktok.post_video(content)
-        if "youtube" in platforms and self.youtube.is_configured():
-            results["youtube"] = self.youtube.post_video("TrendPulse Content", content)
-        if "reddit" in platforms and self.reddit.is_configured():
-            results["reddit"] = self.reddit.post_to_subreddit("technology", "TrendPulse Update", content)
+        for platform, outcome in self._fan_out(self._post_calls(content, platforms)).items():
+            result = outcome.pop("result", None)
+            results[platform] = {**result, **outcome} if isinstance(result, dict) else outcome
         return results
     
-    def get_all_trending_topics(self) -> List[Dict]:
+    def _trend_calls(self, use_async: bool = False, platforms: Optional[List[str]] = None) -> Dict[str, Callable]:
+        return {
+            adapter.name: adapter.trending_async if use_async and adapter.trending_async else adapter.trending
+            for adapter in self.platforms.adapters() if platforms is None or adapter.name in platforms
+        }
+    
+    @property
+    def trend_platforms(self) -> List[str]:
+        return self.platforms.names()
+    
+    def _trend_report(self, outcomes: Dict[str, Dict]) -> Dict:
         topics = []
-        topics.extend(self.twitter.get_trending_topics())
-        topics.extend(self.linkedin.get_trending_topics())
-        topics.extend(self.instagram.get_trending_topics())
-        topics.extend(self.tiktok.get_trending_topics())
-        topics.extend(self.youtube.get_trending_topics())
-        topics.extend(self.reddit.get_trending_topics())
-        return topics
+        platforms = {}
+        for platform, outcome in outcomes.items():
+            found = outcome.pop("result", None) or []
+            topics.extend(found)
+            platforms[platform] = {"topics": len(found), **outcome}
+        return {"topics": topics, "platforms": platforms}
+    
+    def collect_trending_topics(self, platforms: Optional[List[str]] = None) -> Dict:
+        """Trending topics from all platforms, fetched concurrently: {"topics": [...], "platforms": {name: latency/errors}}"""
+        return self._trend_report(self._fan_out(self._trend_calls(platforms=platforms)))
+    
+    async def collect_trending_topics_async(self, platforms: Optional[List[str]] = None) -> Dict:
+        """collect_trending_topics() for async endpoints"""
+        return self._trend_report(await self._fan_out_async(self._trend_calls(use_async=True, platforms=platforms)))
+    
+    def get_all_trending_topics(self) -> List[Dict]:
+        return self.collect_trending_topics()["topics"]
     
     def get_platform_status(self) -> Dict:
         return {
@@ -521,7 +736,6 @@ class SocialMediaService:
     def _get_missing_instagram_config(self) -> List[str]:
         missing = []
         if not os.getenv("INSTAGRAM_ACCESS_TOKEN"): missing.append("INSTAGRAM_ACCESS_TOKEN")
-        if not os.getenv("INSTAGRAM_BUSINESS_ACCOUNT_ID"): missing.append("INSTAGRAM_BUSINESS_ACCOUNT_ID")
         return missing
     def _get_missing_tiktok_config(self) -> List[str]:
         missing = []
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Set
+
+from redis.exceptions import RedisError
+
+from services.redis_client import get_async_redis, get_redis, key
+from services.social_media_service import platform_timeout, social_media_service
+
+# Seconds a platform's trending topics count as fresh; TREND_CACHE_TTL_<PLATFORM> overrides it.
+# A little longer than monitor_trends' 5-minute interval, so the watcher keeps every platform fresh.
+TREND_CACHE_TTL = float(os.getenv("TREND_CACHE_TTL", "360"))
+# Past the TTL, topics are still served (while one request refreshes them) for up to this many seconds
+TREND_CACHE_MAX_STALE = float(os.getenv("TREND_CACHE_MAX_STALE", "3600"))
+
+def trend_ttl(platform: str) -> float:
+    return float(os.getenv(f"TREND_CACHE_TTL_{platform.upper()}", TREND_CACHE_TTL))
+
+class TrendCache:
+    """Each platform's latest trending topics, kept in Redis and in process memory.
+
+    monitor_trends stores what it fetches, so GET /api/social/trends normally
+    reads memory (or one Redis MGET once the local copy expires). A platform
+    past its TTL is served stale-while-revalidate: the cached topics go out
+    immediately and a background task fetches fresh ones, at most one process
+    at a time (a Redis lock held for the fetch timeout). A platform with
+    nothing cached, or older than TREND_CACHE_MAX_STALE, is fetched before
+    responding. Failed fetches never replace cached topics.
+    """
+
+    def __init__(self):
+        self._local: Dict[str, Dict] = {}
+        self._refreshing: Dict[str, asyncio.Future] = {}
+        # Platforms whose last fetch failed, with the error
+        self._errors: Dict[str, Dict] = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {"fresh": 0, "stale": 0, "misses": 0, "refreshes": 0, "errors": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _key(self, platform: str) -> str:
+        return key("trends", "live", platform)
+
+    def _lock_key(self, platform: str) -> str:
+        return key("trends", "refresh", platform)
+
+    def _entries(self, report: Dict) -> Dict[str, Dict]:
+        """Cache entries for the platforms a trend report fetched successfully"""
+        fetched_at = time.time()
+        entries = {}
+        for platform, outcome in report["platforms"].items():
+            if "error" in outcome:
+                continue
+            entries[platform] = {
+                "topics": [topic for topic in report["topics"] if topic.get("platform") == platform],
+                "fetched_at": fetched_at,
+                "latency_ms": outcome.get("latency_ms"),
+            }
+        return entries
+
+    def _remember(self, entries: Dict[str, Dict]):
+        for platform, entry in entries.items():
+            current = self._local.get(platform)
+            if current is None or current["fetched_at"] <= entry["fetched_at"]:
+                self._local[platform] = entry
+
+    def store(self, report: Dict):
+        """Cache a collect_trending_topics() report (from the watcher)"""
+        entries = self._entries(report)
+        self._remember(entries)
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for platform, entry in entries.items():
+                pipe.set(self._key(platform), json.dumps(entry), ex=int(TREND_CACHE_MAX_STALE))
+            pipe.execute()
+        except RedisError as e:
+            print(f"Trend cache write failed: {e}")
+            self._count("errors")
+
+    async def _store_async(self, report: Dict):
+        entries = self._entries(report)
+        self._remember(entries)
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            for platform, entry in entries.items():
+                pipe.set(self._key(platform), json.dumps(entry), ex=int(TREND_CACHE_MAX_STALE))
+            await pipe.execute()
+        except RedisError as e:
+            print(f"Trend cache write failed: {e}")
+            self._count("errors")
+
+    async def _load(self, platforms: List[str]):
+        """Pick up newer entries other processes (the watcher) wrote for `platforms`"""
+        try:
+            values = await get_async_redis().mget([self._key(platform) for platform in platforms])
+        except RedisError as e:
+            print(f"Trend cache unavailable: {e}")
+            self._count("errors")
+            return
+        self._remember({platform: json.loads(value) for platform, value in zip(platforms, values) if value})
+
+    async def get_async(self) -> Dict:
+        """{"topics": [...], "platforms": {name: {"topics", "age_s", "state", "latency_ms"}}} from the cache"""
+        platforms = social_media_service.trend_platforms
+        now = time.time()
+        expired = [
+            platform for platform in platforms
+            if platform not in self._local or now - self._local[platform]["fetched_at"] > trend_ttl(platform)
+        ]
+        if expired:
+            await self._load(expired)
+
+        states = {}
+        for platform in platforms:
+            entry = self._local.get(platform)
+            age = now - entry["fetched_at"] if entry else None
+            if age is None or age > TREND_CACHE_MAX_STALE:
+                states[platform] = "miss"
+            else:
+                states[platform] = "fresh" if age <= trend_ttl(platform) else "stale"
+
+        missing = [platform for platform, state in states.items() if state == "miss"]
+        stale = [platform for platform, state in states.items() if state == "stale"]
+        self._count("fresh", len(platforms) - len(missing) - len(stale))
+        self._count("stale", len(stale))
+        self._count("misses", len(missing))
+
+        if missing:
+            # Concurrent requests for the same platforms share one fetch
+            await asyncio.shield(asyncio.gather(*self._fetch(missing, claim=False)))
+        if stale:
+            self._fetch(stale)
+
+        now = time.time()
+        topics = []
+        report = {}
+        for platform in platforms:
+            entry = self._local.get(platform)
+            if entry is None or states[platform] == "miss" and platform in self._errors:
+                report[platform] = {"topics": 0, "state": states[platform], **self._errors.get(platform, {})}
+                continue
+            topics.extend(entry["topics"])
+            report[platform] = {
+                "topics": len(entry["topics"]),
+                "state": states[platform],
+                "age_s": round(now - entry["fetched_at"], 1),
+                "latency_ms": entry.get("latency_ms"),
+            }
+        return {"topics": topics, "platforms": report}
+
+    def _fetch(self, platforms: List[str], claim: bool = True) -> Set[asyncio.Future]:
+        """Fetch tasks covering `platforms`, joining ones already running in this process"""
+        tasks = {self._refreshing[platform] for platform in platforms if platform in self._refreshing}
+        new = [platform for platform in platforms if platform not in self._refreshing]
+        if new:
+            task = asyncio.ensure_future(self._refresh(new, claim))
+            for platform in new:
+                self._refreshing[platform] = task
+
+            def done(_):
+                for platform in new:
+                    self._refreshing.pop(platform, None)
+
+            task.add_done_callback(done)
+            tasks.add(task)
+        return tasks
+
+    async def _refresh(self, platforms: List[str], claim: bool = True):
+        claimed = platforms
+        if claim:
+            try:
+                redis = get_async_redis()
+                claimed = []
+                for platform in platforms:
+                    # Held until it expires: one background refresh per fetch timeout per platform, even if it fails
+                    lock_ttl = int(platform_timeout(platform) * 1000) + 5000
+                    if await redis.set(self._lock_key(platform), os.getpid(), nx=True, px=lock_ttl):
+                        claimed.append(platform)
+            except RedisError as e:
+                print(f"Trend refresh lock failed: {e}")
+                claimed = platforms
+        if not claimed:
+            return
+
+        try:
+            report = await social_media_service.collect_trending_topics_async(claimed)
+        except Exception as e:
+            print(f"Trend refresh of {claimed} failed: {e}")
+            self._count("errors")
+            return
+        self._errors = {
+            **{platform: error for platform, error in self._errors.items() if platform not in claimed},
+            **{platform: outcome for platform, outcome in report["platforms"].items() if "error" in outcome},
+        }
+        await self._store_async(report)
+        self._count("refreshes", len(claimed))
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        now = time.time()
+        stats["ttl"] = {platform: trend_ttl(platform) for platform in social_media_service.trend_platforms}
+        stats["max_stale"] = TREND_CACHE_MAX_STALE
+        stats["age_s"] = {platform: round(now - entry["fetched_at"], 1) for platform, entry in self._local.items()}
+        stats["refreshing"] = sorted(self._refreshing)
+        return stats
+
+# Create global instance
+trend_cache = TrendCache()